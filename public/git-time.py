@@ -6,11 +6,26 @@ import datetime
 import os
 import sys
 import argparse
+import asyncio
+import json
 from collections import defaultdict
 import time
+import threading
 import math
+import heapq
+import bisect
+import random
 import shutil
 import re
+import mmap
+import struct
+import signal
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou de fichier
+    fcntl = None
 
 # Couleurs ANSI pour le terminal
 class Colors:
@@ -170,6 +185,12 @@ def run_git_command(repo_path, command, verbose=False):
         print_error(f"Erreur: {str(e)}", indent=2)
         return None
 
+def is_ancestor_commit(repo_path, ancestor, descendant):
+    """Indique si `ancestor` est un ancêtre de `descendant` (historique non réécrit)."""
+    result = subprocess.run(['git', '-C', repo_path, 'merge-base', '--is-ancestor', ancestor, descendant],
+                            capture_output=True, text=True)
+    return result.returncode == 0
+
 def is_git_repo(path, verbose=False):
     """Vérifie si le chemin est un dépôt Git valide."""
     if verbose:
@@ -230,6 +251,55 @@ def get_repo_info(repo_path, verbose=False):
     
     return info
 
+def build_log_filters(author=None, since=None, until=None, branch=None):
+    """Construit les arguments de filtrage communs aux appels `git log`."""
+    filters = []
+    if author:
+        filters.extend(['--author', author])
+    if since:
+        filters.extend(['--since', since])
+    if until:
+        filters.extend(['--until', until])
+    if branch:
+        filters.append(branch)
+    return filters
+
+# Format des lignes de `git log` lues par parse_commit_line
+COMMIT_LOG_FORMAT = '--pretty=format:%H|%an|%ae|%at|%s|%ad'
+
+def parse_commit_line(line):
+    """Convertit une ligne de `git log` (COMMIT_LOG_FORMAT) en commit, ou None."""
+    parts = line.split('|', 5)
+    if len(parts) != 6:
+        return None
+    commit_hash, author_name, author_email, timestamp, message, date_iso = parts
+    
+    # Conversion du timestamp en datetime
+    commit_time = datetime.datetime.fromtimestamp(int(timestamp))
+    
+    return {
+        'hash': commit_hash,
+        'author_name': author_name,
+        'author_email': author_email,
+        'timestamp': int(timestamp),
+        'datetime': commit_time,
+        'message': message,
+        'date_iso': date_iso
+    }
+
+def get_commits_by_hash(repo_path, hashes):
+    """Récupère les commits donnés par leur hash (même format que get_commits), par lots."""
+    commits = []
+    hashes = list(hashes)
+    for start in range(0, len(hashes), NUMSTAT_BATCH_SIZE):
+        output = run_git_command(repo_path, ['show', '-s', COMMIT_LOG_FORMAT, '--date=iso']
+                                 + hashes[start:start + NUMSTAT_BATCH_SIZE], False)
+        for line in (output or '').split('\n'):
+            commit = parse_commit_line(line) if line.strip() else None
+            if commit:
+                commits.append(commit)
+    return commits
+
 def get_commits(repo_path, author=None, since=None, until=None, branch=None, verbose=False):
     """Récupère la liste des commits avec leurs timestamps."""
     if verbose:
@@ -247,16 +317,7 @@ def get_commits(repo_path, author=None, since=None, until=None, branch=None, ver
         if filters:
             print_info(f"Filtres: {', '.join(filters)}", indent=2)
     
-    cmd = ['log', '--pretty=format:%H|%an|%ae|%at|%s|%ad', '--date=iso']
-    
-    if author:
-        cmd.extend(['--author', author])
-    if since:
-        cmd.extend(['--since', since])
-    if until:
-        cmd.extend(['--until', until])
-    if branch:
-        cmd.append(branch)
+    cmd = ['log', COMMIT_LOG_FORMAT, '--date=iso'] + build_log_filters(author, since, until, branch)
         
     output = run_git_command(repo_path, cmd, verbose)
     if not output:
@@ -276,22 +337,9 @@ def get_commits(repo_path, author=None, since=None, until=None, branch=None, ver
             continue
             
         try:
-            parts = line.split('|', 5)
-            if len(parts) == 6:
-                commit_hash, author_name, author_email, timestamp, message, date_iso = parts
-                
-                # Conversion du timestamp en datetime
-                commit_time = datetime.datetime.fromtimestamp(int(timestamp))
-                
-                commits.append({
-                    'hash': commit_hash,
-                    'author_name': author_name,
-                    'author_email': author_email,
-                    'timestamp': int(timestamp),
-                    'datetime': commit_time,
-                    'message': message,
-                    'date_iso': date_iso
-                })
+            commit = parse_commit_line(line)
+            if commit:
+                commits.append(commit)
                 
                 if verbose and total_commits > 200 and i % (total_commits // 10) == 0:
                     print_progress_bar(i+1, total_commits, 
@@ -381,6 +429,400 @@ def calculate_work_sessions(commits, session_threshold=3, verbose=False):
             
     return sessions
 
+class SessionBuilder:
+    """Sessionisation incrémentale de commits reçus du plus récent au plus ancien.
+
+    Les sessions se forment pendant la lecture de `git log`; si l'ordre des
+    dates d'auteur n'est pas respecté (rebase, horloges), le regroupement est
+    refait sur la liste triée à la fin.
+    """
+
+    def __init__(self, session_threshold=3):
+        self.threshold_seconds = session_threshold * 3600
+        self.session_threshold = session_threshold
+        self.commits = []
+        self.sessions = []
+        self.current = []
+        self.ordered = True
+
+    def add(self, commit):
+        self.commits.append(commit)
+        if not self.ordered:
+            return
+        if self.current and commit['timestamp'] > self.current[-1]['timestamp']:
+            self.ordered = False
+            return
+        if self.current and self.current[-1]['timestamp'] - commit['timestamp'] <= self.threshold_seconds:
+            self.current.append(commit)
+        else:
+            if self.current:
+                self.sessions.append(self.current)
+            self.current = [commit]
+
+    def finish(self):
+        """Retourne (commits triés chronologiquement, sessions)."""
+        if not self.ordered:
+            commits = sorted(self.commits, key=lambda x: x['timestamp'])
+            return commits, calculate_work_sessions(commits, self.session_threshold)
+
+        sessions = self.sessions + ([self.current] if self.current else [])
+        return self.commits[::-1], [session[::-1] for session in reversed(sessions)]
+
+# Règles de classification par défaut (catégorie, regex), par ordre de priorité
+DEFAULT_CLASSIFY_RULES = [
+    ('merge', r'^Merge\b'),
+    ('revert', r'^Revert\b|^revert(?:\([^)]*\))?!?:'),
+] + [
+    (kind, rf'^{kind}(?:\([^)]*\))?!?:')
+    for kind in ('feat', 'fix', 'refactor', 'perf', 'docs', 'test', 'style', 'build', 'ci', 'chore')
+]
+TICKET_PATTERN = re.compile(r'\b[A-Z][A-Z0-9]+-\d+\b')
+
+# Référence arrière numérotée (\\1...): les numéros de groupe changent dans la regex combinée
+NUMBERED_BACKREFERENCE = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]')
+
+class CommitClassifier:
+    """Classe les messages de commit avec une seule regex combinée.
+
+    Chaque règle devient une alternative nommée `(?P<rN>...)`: les
+    alternatives sont essayées dans l'ordre, donc la première règle qui
+    correspond l'emporte, en un seul appel à `match` par message.
+    Les règles qui ne peuvent pas être combinées (références arrière
+    numérotées, drapeaux globaux comme `(?i)`) sont testées seules, à leur
+    rang de priorité.
+    """
+
+    def __init__(self, rules=None):
+        rules = list(rules or []) + DEFAULT_CLASSIFY_RULES
+        self.categories = [category for category, _ in rules]
+        # (regex compilée, combinée ?, catégorie des règles seules), dans l'ordre de priorité
+        self.matchers = []
+        group = []
+        for i, (_, regex) in enumerate(rules):
+            if not NUMBERED_BACKREFERENCE.search(regex):
+                try:
+                    combined = self.combine(rules, group + [i])
+                    group.append(i)
+                    continue
+                except re.error:
+                    pass
+            if group:
+                self.matchers.append((self.combine(rules, group), True, None))
+                group = []
+            # Règle seule: compilée telle quelle, sans groupe nommé qui décalerait ses numéros de groupe
+            self.matchers.append((re.compile(regex, re.IGNORECASE), False, self.categories[i]))
+        if group:
+            self.matchers.append((combined, True, None))
+
+    @staticmethod
+    def is_anchored(regex):
+        """Indique si toutes les alternatives de premier niveau commencent par ^ (ou \\A)."""
+        alternatives, start, depth, in_class, i = [], 0, 0, False, 0
+        while i < len(regex):
+            char = regex[i]
+            if char == '\\':
+                i += 1
+            elif in_class:
+                in_class = char != ']'
+            elif char == '[':
+                in_class = True
+                # Un ] en tête de classe est littéral
+                if regex[i + 1:i + 2] == '^':
+                    i += 1
+                if regex[i + 1:i + 2] == ']':
+                    i += 1
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif char == '|' and depth == 0:
+                alternatives.append(regex[start:i])
+                start = i + 1
+            i += 1
+        alternatives.append(regex[start:])
+        return all(alternative.startswith(('^', '\\A')) for alternative in alternatives)
+
+    @classmethod
+    def combine(cls, rules, indices):
+        # Inutile de parcourir le message pour les règles ancrées en début de ligne
+        alternatives = '|'.join(f"(?:{'' if cls.is_anchored(rules[i][1]) else '.*?'}(?P<r{i}>{rules[i][1]}))"
+                                for i in indices)
+        return re.compile(f"^(?:{alternatives})", re.IGNORECASE)
+
+    def classify(self, commit):
+        commit['category'] = 'autre'
+        for pattern, combined, category in self.matchers:
+            match = pattern.match(commit['message']) if combined else pattern.search(commit['message'])
+            if match:
+                commit['category'] = self.categories[int(match.lastgroup[1:])] if combined else category
+                break
+        commit['tickets'] = TICKET_PATTERN.findall(commit['message'])
+        return commit
+
+def load_classify_rules(filename):
+    """Lit un fichier de règles `catégorie = regex` (lignes vides et # ignorées)."""
+    rules = []
+    with open(filename, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            category, sep, regex = line.partition('=')
+            if not sep or not category.strip() or not regex.strip():
+                raise ValueError(f"{filename}:{number}: règle invalide (attendu: catégorie = regex)")
+            try:
+                # Mêmes options que le classement (une règle non combinable est testée seule)
+                re.compile(regex.strip(), re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"{filename}:{number}: regex invalide: {e}")
+            rules.append((category.strip(), regex.strip()))
+    return rules
+
+def summarize_categories(sessions, time_estimate):
+    """Heures (partagées entre les commits d'une session), commits et sessions par catégorie et par ticket."""
+    categories = defaultdict(lambda: {'hours': 0.0, 'commits': 0, 'sessions': 0})
+    tickets = defaultdict(lambda: {'hours': 0.0, 'commits': 0})
+    for session, details in zip(sessions, time_estimate['session_details']):
+        share = details['estimated_hours'] / len(session)
+        for category in {c.get('category', 'autre') for c in session}:
+            categories[category]['sessions'] += 1
+        for commit in session:
+            entry = categories[commit.get('category', 'autre')]
+            entry['hours'] += share
+            entry['commits'] += 1
+            for ticket in commit.get('tickets', ()):
+                tickets[ticket]['hours'] += share
+                tickets[ticket]['commits'] += 1
+    return dict(categories), dict(tickets)
+
+class GitStageError(Exception):
+    """Échec d'une commande git pendant une étape du démarrage."""
+
+    def __init__(self, stage, message):
+        super().__init__(message)
+        self.stage = stage
+
+async def run_git_async(repo_path, command, stage, allow_failure=False):
+    """Exécute une commande git sans bloquer la boucle asyncio."""
+    process = await asyncio.create_subprocess_exec(
+        'git', '-C', repo_path, *command,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        if allow_failure:
+            return None
+        raise GitStageError(stage, stderr.decode('utf-8', errors='replace').strip())
+    return stdout.decode('utf-8', errors='replace').strip()
+
+async def stream_git_lines_async(repo_path, command, stage, on_line):
+    """Lit la sortie d'une commande git ligne par ligne, au fil de l'eau."""
+    process = await asyncio.create_subprocess_exec(
+        'git', '-C', repo_path, *command,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=1024 * 1024)
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    while True:
+        line = await process.stdout.readline()
+        if not line:
+            break
+        on_line(line.decode('utf-8', errors='replace').rstrip('\n'))
+    stderr = await stderr_task
+    if await process.wait() != 0:
+        raise GitStageError(stage, stderr.decode('utf-8', errors='replace').strip())
+
+async def get_repo_info_async(repo_path):
+    """Équivalent de get_repo_info dont les quatre requêtes git sont concurrentes."""
+    remote_url, branch, last_hash, last_date = await asyncio.gather(
+        run_git_async(repo_path, ['config', '--get', 'remote.origin.url'], 'infos du dépôt', allow_failure=True),
+        run_git_async(repo_path, ['rev-parse', '--abbrev-ref', 'HEAD'], 'infos du dépôt', allow_failure=True),
+        run_git_async(repo_path, ['rev-parse', 'HEAD'], 'infos du dépôt', allow_failure=True),
+        run_git_async(repo_path, ['log', '-1', '--format=%cd', '--date=iso'], 'infos du dépôt', allow_failure=True))
+
+    if remote_url:
+        name = os.path.basename(remote_url)
+        name = name[:-4] if name.endswith('.git') else name
+    else:
+        name = os.path.basename(os.path.abspath(repo_path))
+    return {
+        'name': name,
+        'branch': branch or "inconnu",
+        'last_commit': {
+            'hash': last_hash[:8] if last_hash else "inconnu",
+            'date': last_date if last_date else "inconnu"
+        }
+    }
+
+async def run_startup_pipeline(repo_path, author=None, since=None, until=None, branch=None, session_threshold=3,
+                               collect_numstat=False, verbose=False, classifier=None):
+    """Lance en parallèle les infos du dépôt, le flux des commits et le flux numstat.
+
+    Retourne (repo_info, commits, sessions, numstat); numstat vaut None si le
+    flux n'a pas été demandé ou a échoué.
+    """
+    filters = build_log_filters(author, since, until, branch)
+    builder = SessionBuilder(session_threshold)
+
+    def on_commit_line(line):
+        if line.strip():
+            try:
+                commit = parse_commit_line(line)
+            except ValueError:
+                commit = None
+            if commit:
+                if classifier:
+                    classifier.classify(commit)
+                builder.add(commit)
+            else:
+                print_error(f"Erreur lors du traitement du commit: {line}", indent=2)
+
+    numstat = {}
+    current = []
+    def on_numstat_line(line):
+        if line.startswith('\x1e'):
+            current[:] = [line[1:].strip()]
+            numstat[current[0]] = []
+        elif line and current:
+            numstat[current[0]].extend(parse_numstat_lines([line]))
+
+    stages = {
+        'infos du dépôt': get_repo_info_async(repo_path),
+        'commits': stream_git_lines_async(repo_path, ['log', COMMIT_LOG_FORMAT, '--date=iso'] + filters,
+                                          'commits', on_commit_line)
+    }
+    if collect_numstat:
+        stages['statistiques'] = stream_git_lines_async(
+            repo_path, ['log', '--numstat', '--diff-merges=first-parent', '--format=%x1e%H'] + filters,
+            'statistiques', on_numstat_line)
+
+    if verbose:
+        print_step(f"Démarrage concurrent: {', '.join(stages)}", "⚡")
+    results = dict(zip(stages, await asyncio.gather(*stages.values(), return_exceptions=True)))
+
+    for stage, result in results.items():
+        if isinstance(result, Exception):
+            message = result.args[0] if isinstance(result, GitStageError) else str(result)
+            print_error(f"Erreur Git ({stage}): {message}", indent=2)
+
+    repo_info = results['infos du dépôt']
+    if isinstance(repo_info, Exception):
+        repo_info = {'name': os.path.basename(repo_path), 'branch': "inconnu",
+                     'last_commit': {'hash': "inconnu", 'date': "inconnu"}}
+    if isinstance(results['commits'], Exception):
+        return repo_info, [], [], None
+    if isinstance(results.get('statistiques'), Exception):
+        numstat = None
+
+    commits, sessions = builder.finish()
+    if verbose:
+        print_success(f"{len(commits)} commits lus et {len(sessions)} sessions formées au fil du flux"
+                      + ("" if builder.ordered else " (regroupement refait après tri)"), indent=2)
+    return repo_info, commits, sessions, numstat if collect_numstat else None
+
+def discover_submodules(repo_path, prefix=''):
+    """Sous-modules initialisés (récursivement): chemins de .gitmodules et entrées 160000 de l'index.
+
+    Retourne une liste de (chemin relatif au dépôt principal, chemin absolu).
+    """
+    paths = set()
+    if os.path.exists(os.path.join(repo_path, '.gitmodules')):
+        result = subprocess.run(['git', '-C', repo_path, 'config', '-f', '.gitmodules', '--get-regexp', r'^submodule\..*\.path$'],
+                                capture_output=True, text=True)
+        paths.update(line.split(' ', 1)[1] for line in result.stdout.splitlines() if ' ' in line)
+    result = subprocess.run(['git', '-C', repo_path, 'ls-files', '--stage'], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith('160000 '):
+            paths.add(line.split('\t', 1)[1])
+
+    submodules = []
+    for path in sorted(paths):
+        full_path = os.path.join(repo_path, path)
+        if not os.path.exists(os.path.join(full_path, '.git')):
+            print_warning(f"Sous-module {prefix}{path} non initialisé, ignoré", indent=2)
+            continue
+        submodules.append((prefix + path, full_path))
+        submodules.extend(discover_submodules(full_path, f"{prefix}{path}/"))
+    return submodules
+
+async def collect_submodules(submodules, author=None, since=None, until=None, session_threshold=3,
+                             collect_numstat=(), verbose=False, classifier=None):
+    """Lit les commits de chaque sous-module en parallèle, avec les mêmes filtres que le dépôt principal.
+
+    `collect_numstat` contient les sous-modules pour lesquels lancer aussi le flux numstat.
+    Retourne {chemin: (commits, numstat ou None)}.
+    """
+    async def collect(name, path):
+        _, commits, _, numstat = await run_startup_pipeline(path, author, since, until, None, session_threshold,
+                                                            name in collect_numstat, False, classifier)
+        for commit in commits:
+            commit['repo'] = name
+        if verbose:
+            print_info(f"{name}: {len(commits)} commits", indent=2)
+        return commits, numstat
+
+    results = await asyncio.gather(*(collect(name, path) for name, path in submodules))
+    return dict(zip((name for name, _ in submodules), results))
+
+def unify_author_identities(commits):
+    """Attribue un même nom d'auteur à tous les commits d'un email (insensible à la casse).
+
+    Le nom retenu est le plus fréquent pour cet email, tous dépôts confondus.
+    """
+    names = defaultdict(lambda: defaultdict(int))
+    for commit in commits:
+        names[commit['author_email'].lower()][commit['author_name']] += 1
+    canonical = {email: max(counts.items(), key=lambda x: x[1])[0] for email, counts in names.items()}
+    for commit in commits:
+        commit['author_name'] = canonical[commit['author_email'].lower()]
+
+def summarize_repositories(commits, session_threshold=3):
+    """Sous-totaux par dépôt (clé 'repo' des commits), dépôt principal en premier."""
+    by_repo = defaultdict(list)
+    for commit in commits:
+        by_repo[commit.get('repo', '.')].append(commit)
+
+    summary = []
+    for path in sorted(by_repo, key=lambda p: (p != '.', p)):
+        repo_commits = by_repo[path]
+        sessions = calculate_work_sessions(repo_commits, session_threshold)
+        summary.append({'path': path, 'commits': len(repo_commits), 'sessions': len(sessions),
+                        'hours': estimate_work_time(sessions)['total_hours'],
+                        'authors': len({c['author_name'] for c in repo_commits})})
+    return summary
+
+class PrefetchedStatsStore:
+    """Numstat déjà lu par le pipeline de démarrage (interface de fetch_numstat)."""
+
+    def __init__(self, numstat):
+        self.numstat = numstat
+
+    def lookup(self, hashes):
+        return {h: self.numstat[h] for h in hashes if h in self.numstat}
+
+    def store(self, numstat):
+        pass
+
+    def flush(self, verbose=False):
+        pass
+
+# Paramètres par défaut de l'estimation d'une session
+MAX_SESSION_HOURS = 8
+MIN_SESSION_HOURS = 0.5
+COMMIT_FACTOR = 0.1
+MAX_COMMIT_FACTOR = 2
+
+def session_estimated_hours(hours, commits_count, max_hours=MAX_SESSION_HOURS, min_hours=MIN_SESSION_HOURS,
+                            commit_factor=COMMIT_FACTOR, max_commit_factor=MAX_COMMIT_FACTOR):
+    """Estime la durée de travail d'une session à partir de sa durée brute et de ses commits."""
+    # Limiter à une durée raisonnable de travail continu
+    adjusted_hours = min(hours, max_hours) if hours > 0 else min_hours
+    
+    # Ajouter un minimum de temps par session
+    if adjusted_hours < min_hours and commits_count > 0:
+        adjusted_hours = min_hours
+        
+    # Ajuster en fonction du nombre de commits dans la session
+    factor = min(1 + (commits_count - 1) * commit_factor, max_commit_factor)
+    return adjusted_hours * factor
+
 def estimate_work_time(sessions, verbose=False):
     """Estime le temps de travail total à partir des sessions."""
     if not sessions:
@@ -406,16 +848,7 @@ def estimate_work_time(sessions, verbose=False):
         hours = duration.total_seconds() / 3600
         total_raw_hours += hours
         
-        # Limiter à une durée raisonnable de travail continu
-        adjusted_hours = min(hours, 8) if hours > 0 else 0.5
-        
-        # Ajouter un minimum de temps par session
-        if adjusted_hours < 0.5 and len(session) > 0:
-            adjusted_hours = 0.5
-            
-        # Ajuster en fonction du nombre de commits dans la session
-        commit_factor = min(1 + (len(session) - 1) * 0.1, 2)
-        final_hours = adjusted_hours * commit_factor
+        final_hours = session_estimated_hours(hours, len(session))
         
         total_hours += final_hours
         
@@ -444,6 +877,116 @@ def estimate_work_time(sessions, verbose=False):
         'session_details': session_details
     }
 
+# Paramètres balayables par --sweep et valeur par défaut correspondante
+SWEEP_PARAMETERS = {
+    'threshold': 3.0,
+    'cap': MAX_SESSION_HOURS,
+    'floor': MIN_SESSION_HOURS,
+    'factor': COMMIT_FACTOR,
+    'max-factor': MAX_COMMIT_FACTOR
+}
+
+def parse_sweep_spec(spec):
+    """Interprète NOM=DÉBUT:FIN:PAS ou NOM=v1,v2,... et retourne (nom, valeurs)."""
+    name, sep, values = spec.partition('=')
+    name = name.strip()
+    if not sep or name not in SWEEP_PARAMETERS:
+        raise ValueError(f"paramètre de balayage invalide: {spec} (choix: {', '.join(SWEEP_PARAMETERS)})")
+
+    if ':' in values:
+        start, stop, step = (float(v) for v in values.split(':'))
+        if step <= 0 or stop < start:
+            raise ValueError(f"intervalle de balayage invalide: {spec}")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        result = [round(start + k * step, 10) for k in range(count)]
+    else:
+        result = [float(v) for v in values.split(',') if v.strip()]
+    if not result:
+        raise ValueError(f"aucune valeur pour le balayage: {spec}")
+    return name, sorted(set(result))
+
+def sweep_work_time(commits, sweeps, verbose=False):
+    """Estime le temps pour chaque combinaison de paramètres en une seule passe.
+
+    Les écarts entre commits sont triés une fois: augmenter le seuil ne fait
+    que fusionner des sessions voisines, chaque fusion met à jour le total de
+    toutes les combinaisons (cap, floor, factor, max-factor) en O(combinaisons).
+    """
+    thresholds = sweeps.get('threshold', [SWEEP_PARAMETERS['threshold']])
+    names = ['cap', 'floor', 'factor', 'max-factor']
+    combos = [()]
+    for name in names:
+        combos = [c + (v,) for c in combos for v in sweeps.get(name, [SWEEP_PARAMETERS[name]])]
+
+    if verbose:
+        print_step("Balayage des paramètres d'estimation", "🧪")
+        print_info(f"{len(thresholds)} seuils × {len(combos)} combinaisons", indent=2)
+
+    times = [c['timestamp'] for c in commits]
+    n = len(times)
+    gaps = sorted(range(n - 1), key=lambda i: times[i + 1] - times[i])
+
+    def contribution(a, b):
+        hours = (times[b] - times[a]) / 3600
+        return [session_estimated_hours(hours, b - a + 1, *combo) for combo in combos]
+
+    # Chaque session est l'intervalle [a, b]: left[b] = a, right[a] = b
+    left = list(range(n))
+    right = list(range(n))
+    single = contribution(0, 0)
+    totals = [value * n for value in single]
+    sessions_count = n
+
+    rows = []
+    next_gap = 0
+    for threshold in thresholds:
+        while next_gap < len(gaps) and (times[gaps[next_gap] + 1] - times[gaps[next_gap]]) / 3600 <= threshold:
+            i = gaps[next_gap]
+            a, b = left[i], right[i + 1]
+            removed_left = contribution(a, i)
+            removed_right = contribution(i + 1, b)
+            merged = contribution(a, b)
+            for p in range(len(combos)):
+                totals[p] += merged[p] - removed_left[p] - removed_right[p]
+            right[a] = b
+            left[b] = a
+            sessions_count -= 1
+            next_gap += 1
+
+        for p, combo in enumerate(combos):
+            rows.append({
+                'threshold': threshold,
+                'cap': combo[0],
+                'floor': combo[1],
+                'factor': combo[2],
+                'max-factor': combo[3],
+                'sessions': sessions_count,
+                'total_hours': totals[p]
+            })
+
+    return rows
+
+def print_sweep_report(rows, csv_filename=None):
+    """Affiche (ou exporte en CSV) le résultat d'un balayage de paramètres."""
+    columns = ['threshold', 'cap', 'floor', 'factor', 'max-factor', 'sessions', 'total_hours']
+
+    if csv_filename:
+        import csv
+        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([f"{row['total_hours']:.2f}" if c == 'total_hours' else row[c] for c in columns])
+        print_success(f"Balayage exporté vers {csv_filename} ({len(rows)} combinaisons)")
+        return
+
+    print_subheader("BALAYAGE DES PARAMÈTRES D'ESTIMATION")
+    header = ['Seuil (h)', 'Plafond (h)', 'Plancher (h)', 'Facteur', 'Facteur max', 'Sessions', 'Heures']
+    print("  " + "  ".join(h.rjust(12) for h in header))
+    for row in rows:
+        values = [f"{row[c]:g}" for c in columns[:5]] + [str(row['sessions']), f"{row['total_hours']:.2f}"]
+        print("  " + "  ".join(v.rjust(12) for v in values))
+
 def generate_chart(data, max_value, title, width=40, show_percentage=True):
     """Génère un graphique simple en ASCII art."""
     print(f"\n  {Colors.BOLD}{title}{Colors.ENDC}")
@@ -568,138 +1111,1915 @@ def generate_calendar_heatmap(commits, year=None, month=None):
     # Légende
     print(f"  Légende: {Colors.GREEN}▁{Colors.ENDC} Faible, {Colors.YELLOW}▅{Colors.ENDC} Moyen, {Colors.RED}█{Colors.ENDC} Élevé")
 
-def print_report(repo_path, repo_info, commits, sessions, time_estimate, author=None, since=None, until=None, branch=None, verbose=False, detailed=False):
-    """Affiche un rapport détaillé des statistiques."""
-    if not commits:
-        print_warning("Aucun commit trouvé correspondant aux critères.")
-        return
-    
+# Nombre de commits passés à un seul appel `git show --numstat`
+NUMSTAT_BATCH_SIZE = 256
+
+# Classes de taille des commits (lignes modifiées)
+COMMIT_SIZE_BUCKETS = [
+    ("Petits (<10)", 0, 10),
+    ("Moyens (<100)", 10, 100),
+    ("Grands (<500)", 100, 500),
+    ("Énormes (500+)", 500, None)
+]
+
+def classify_commit_size(changes):
+    """Retourne l'indice de la classe de taille d'un commit."""
+    for i, (_, low, high) in enumerate(COMMIT_SIZE_BUCKETS):
+        if changes >= low and (high is None or changes < high):
+            return i
+    return len(COMMIT_SIZE_BUCKETS) - 1
+
+def parse_numstat_lines(lines):
+    """Convertit des lignes `--numstat` en liste (chemin, insertions, suppressions)."""
+    files = []
+    for line in lines:
+        parts = line.split('\t', 2)
+        if len(parts) != 3:
+            continue
+        # Les fichiers binaires sont signalés par "-"
+        insertions = int(parts[0]) if parts[0].isdigit() else 0
+        deletions = int(parts[1]) if parts[1].isdigit() else 0
+        files.append((parts[2], insertions, deletions))
+    return files
+
+def make_commit_stats(commit, files):
+    """Construit les statistiques d'un commit à partir de son numstat."""
+    insertions = sum(f[1] for f in files)
+    deletions = sum(f[2] for f in files)
+    return {
+        'hash': commit['hash'],
+        'datetime': commit['datetime'],
+        'files_changed': len(files),
+        'insertions': insertions,
+        'deletions': deletions,
+        'changes': insertions + deletions,
+        'files': files
+    }
+
+def get_numstat_batch(repo_path, hashes):
+    """Récupère le numstat de plusieurs commits en un seul appel git."""
+    if not hashes:
+        return {}
+    output = run_git_command(repo_path, ['show', '--numstat', '--format=format:%x1e%H'] + list(hashes), False)
+    if output is None:
+        return {}
+
+    result = {}
+    for block in output.split('\x1e'):
+        lines = block.strip('\n').split('\n')
+        if not lines or not lines[0].strip():
+            continue
+        result[lines[0].strip()] = parse_numstat_lines(lines[1:])
+    return result
+
+def stream_log_numstat(repo_path, log_args, verbose=False):
+    """Parcourt `git log --numstat` en flux et produit (commit, fichiers) au fil de l'eau."""
+    cmd = ['git', '-C', repo_path, 'log', '--numstat', '--diff-merges=first-parent', '--date=iso',
+           '--format=%x1e%H%x1f%an%x1f%ae%x1f%at%x1f%ad%x1f%s'] + log_args
     if verbose:
-        print_step("Génération du rapport final", "📋")
-        
-    print_header(f"RAPPORT D'ANALYSE - {repo_info['name'].upper()}")
-    
-    print(f"\n{Colors.BOLD}Informations du projet{Colors.ENDC}")
-    print_value("Répertoire", repo_path, indent=2)
-    print_value("Dépôt", repo_info['name'], indent=2)
-    print_value("Branche", repo_info['branch'], indent=2)
-    
-    if author:
-        print_value("Auteur", author, indent=2)
-    if since or until:
-        date_range = []
-        if since:
-            date_range.append(f"depuis {since}")
-        if until:
-            date_range.append(f"jusqu'à {until}")
-        print_value("Période", ", ".join(date_range), indent=2)
-        
-    # Statistiques générales
-    first_commit = commits[0]['datetime']
-    last_commit = commits[-1]['datetime']
-    project_duration = last_commit - first_commit
-    project_days = max(1, project_duration.days)
-    
-    # Compter les auteurs
-    authors = {}
-    for commit in commits:
-        author_name = commit['author_name']
-        if author_name not in authors:
-            authors[author_name] = 0
-        authors[author_name] += 1
-    
-    print_subheader("STATISTIQUES GÉNÉRALES")
-    
-    print_value("Total des commits", len(commits), indent=2, highlight=True)
-    print_value("Premier commit", first_commit.strftime('%Y-%m-%d %H:%M:%S'), indent=2)
-    print_value("Dernier commit", last_commit.strftime('%Y-%m-%d %H:%M:%S'), indent=2)
-    
-    months = project_duration.days // 30
-    days = project_duration.days % 30
-    if months > 0:
-        duration_text = f"{months} mois, {days} jours"
-    else:
-        duration_text = f"{project_days} jours"
-    print_value("Durée du projet", duration_text, indent=2)
-    print_value("Moyenne de commits par jour", f"{len(commits) / project_days:.2f}", indent=2)
-    
-    # Principales statistiques horaires
-    print_value("Commits par semaine", f"{len(commits) / (project_days/7):.1f}", indent=2)
-    print_value("Commits par mois", f"{len(commits) / max(1, months):.1f}", indent=2)
-    
-    # Contributeurs
-    if len(authors) > 1:
-        print(f"\n{Colors.BOLD}Contributeurs{Colors.ENDC}")
-        sorted_authors = sorted(authors.items(), key=lambda x: x[1], reverse=True)
-        
-        # Génération du graphique des contributeurs
-        if len(sorted_authors) > 0:
-            max_commits = sorted_authors[0][1]
-            top_authors = sorted_authors[:min(8, len(sorted_authors))]
-            generate_chart(top_authors, max_commits, "Contributions par auteur")
-            if len(sorted_authors) > 8:
-                print_info(f"... et {len(sorted_authors)-8} autres contributeurs", indent=2)
-    
-    # Estimation du temps
-    print_subheader("ESTIMATION DU TEMPS DE TRAVAIL")
-    
-    print_value("Temps total estimé", f"{time_estimate['total_hours']:.2f}", "heures", indent=2, highlight=True)
-    print_value("Équivalent en jours de travail (8h)", f"{time_estimate['total_hours']/8:.2f}", "jours", indent=2)
-    print_value("Nombre de sessions de travail", time_estimate['sessions_count'], indent=2)
-    
-    if time_estimate['sessions_count'] > 0:
-        avg_session_duration = time_estimate['total_hours'] / time_estimate['sessions_count']
-        print_value("Durée moyenne par session", f"{avg_session_duration:.2f}", "heures", indent=2)
-        print_value("Temps moyen par commit", f"{time_estimate['total_hours']/len(commits):.2f}", "heures", indent=2)
-        
-        # Facteur d'ajustement
-        adjustment_factor = time_estimate['total_hours'] / time_estimate['total_raw_hours'] if time_estimate['total_raw_hours'] > 0 else 1
-        print_value("Facteur d'ajustement appliqué", f"{adjustment_factor:.2f}x", indent=2)
-        
-        # Top 5 des sessions les plus longues
-        if detailed or verbose:
-            print(f"\n{Colors.BOLD}Top 5 des sessions les plus longues{Colors.ENDC}")
-            sorted_sessions = sorted(time_estimate['session_details'], 
-                                    key=lambda x: x['estimated_hours'], 
-                                    reverse=True)
-            for i, session in enumerate(sorted_sessions[:5]):
-                start_date = session['start'].strftime('%Y-%m-%d')
-                start_time = session['start'].strftime('%H:%M')
-                hours = session['estimated_hours']
-                commits_count = session['commits']
-                
-                commit_msg = session['start'].strftime('%Y-%m-%d %H:%M')
-                print_info(f"{i+1}. {start_date} à {start_time} - {hours:.2f}h ({commits_count} commits) - \"{commit_msg}\"", indent=2)
-    
-    # Distribution des sessions par jour de la semaine
-    if time_estimate['sessions_count'] > 0:
-        days = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
-        day_dist = defaultdict(int)
-        hour_dist = defaultdict(int)
-        day_hours = defaultdict(float)
-        
-        for session in time_estimate['session_details']:
-            day = session['start'].weekday()
-            hour = session['start'].hour
-            day_dist[day] += 1
-            hour_dist[hour] += 1
-            day_hours[day] += session['estimated_hours']
-            
-        # Génération du graphique des jours (nombre de sessions)
-        day_data = [(days[day_idx], count) for day_idx, count in sorted(day_dist.items())]
-        if day_data:
-            max_count = max(count for _, count in day_data)
-            generate_chart(day_data, max_count, "Sessions par jour de la semaine")
-        
-        # Génération du graphique des jours (heures de travail)
-        if detailed or verbose:
-            day_hours_data = [(days[day_idx], hours) for day_idx, hours in sorted(day_hours.items())]
-            if day_hours_data:
-                max_hours = max(hours for _, hours in day_hours_data)
-                generate_chart(day_hours_data, max_hours, "Heures de travail par jour de la semaine")
-        
-        # Distribution par heure de la journée
-        if detailed or verbose:
+        print_info(f"Exécution: {' '.join(cmd)}", indent=2)
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+    commit = None
+    files = []
+    for line in process.stdout:
+        line = line.rstrip('\n')
+        if line.startswith('\x1e'):
+            if commit:
+                yield commit, files
+            parts = line[1:].split('\x1f', 5)
+            if len(parts) != 6:
+                commit = None
+                continue
+            commit_hash, author_name, author_email, timestamp, date_iso, message = parts
+            commit = {
+                'hash': commit_hash,
+                'author_name': author_name,
+                'author_email': author_email,
+                'timestamp': int(timestamp),
+                'datetime': datetime.datetime.fromtimestamp(int(timestamp)),
+                'message': message,
+                'date_iso': date_iso
+            }
+            files = []
+        elif line:
+            files.extend(parse_numstat_lines([line]))
+    if commit:
+        yield commit, files
+
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        print_error(f"Erreur Git: {stderr}", indent=2)
+
+def format_numstat_lines(files):
+    """Sérialise une liste (chemin, insertions, suppressions) au format numstat."""
+    return ''.join(f"{insertions}\t{deletions}\t{path}\n" for path, insertions, deletions in files)
+
+# Version du format des notes: les notes d'une autre version sont recalculées
+NOTES_FORMAT_VERSION = 1
+NOTES_HEADER = f"git-time-stats v{NOTES_FORMAT_VERSION}"
+
+class NotesStatsStore:
+    """Statistiques par commit partagées via un ref de notes (refs/notes/git-time)."""
+
+    def __init__(self, repo_path, ref='refs/notes/git-time'):
+        self.repo_path = repo_path
+        self.ref = ref
+        self.blobs = None
+        self.pending = {}
+        # Notes d'un ancien format, à réécrire
+        self.outdated = set()
+        self.hits = 0
+
+    def load_index(self):
+        """Liste toutes les notes du ref en un seul appel `git notes list`."""
+        self.blobs = {}
+        result = subprocess.run(['git', '-C', self.repo_path, 'notes', '--ref', self.ref, 'list'],
+                                capture_output=True, text=True)
+        # Un ref de notes absent n'est pas une erreur
+        if result.returncode != 0:
+            return
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                self.blobs[parts[1]] = parts[0]
+
+    def lookup(self, hashes):
+        """Lit en lot les notes des commits demandés avec `git cat-file --batch`."""
+        if self.blobs is None:
+            self.load_index()
+        wanted = [h for h in hashes if h in self.blobs]
+        if not wanted:
+            return {}
+
+        request = ''.join(f"{self.blobs[h]}\n" for h in wanted).encode()
+        result = subprocess.run(['git', '-C', self.repo_path, 'cat-file', '--batch'],
+                                input=request, capture_output=True, check=True)
+        output = result.stdout
+
+        found = {}
+        pos = 0
+        for commit_hash in wanted:
+            header_end = output.index(b'\n', pos)
+            header = output[pos:header_end].split()
+            pos = header_end + 1
+            if len(header) < 3 or header[1] != b'blob':
+                continue
+            size = int(header[2])
+            content = output[pos:pos + size].decode('utf-8', errors='replace')
+            pos += size + 1
+
+            lines = content.split('\n')
+            # Note d'un ancien format: le commit sera recalculé
+            if lines[0] != NOTES_HEADER:
+                self.outdated.add(commit_hash)
+                continue
+            found[commit_hash] = parse_numstat_lines(lines[1:])
+
+        self.hits += len(found)
+        return found
+
+    def store(self, numstat):
+        self.pending.update(numstat)
+
+    def flush(self, verbose=False):
+        """Écrit toutes les nouvelles notes en un seul commit via `git fast-import`."""
+        if self.blobs is None:
+            self.load_index()
+        self.pending = {h: files for h, files in self.pending.items()
+                        if h not in self.blobs or h in self.outdated}
+        if not self.pending:
+            return
+
+        message = f"git-time: statistiques de {len(self.pending)} commits\n".encode()
+        stream = [f"commit {self.ref}\n".encode(),
+                  f"committer git-time <git-time@localhost> {int(time.time())} +0000\n".encode(),
+                  f"data {len(message)}\n".encode(), message]
+        if run_git_command(self.repo_path, ['rev-parse', '--verify', '--quiet', self.ref], False):
+            stream.append(f"from {self.ref}^0\n".encode())
+        for commit_hash, files in self.pending.items():
+            content = (NOTES_HEADER + '\n' + format_numstat_lines(files)).encode('utf-8')
+            stream.append(f"N inline {commit_hash}\ndata {len(content)}\n".encode())
+            stream.append(content + b'\n')
+
+        subprocess.run(['git', '-C', self.repo_path, 'fast-import', '--quiet'],
+                       input=b''.join(stream), capture_output=True, check=True)
+        if verbose:
+            print_info(f"{len(self.pending)} notes écrites dans {self.ref} (partage: git push origin {self.ref})", indent=2)
+        self.pending = {}
+        self.blobs = None
+        self.outdated = set()
+
+def get_git_dir(repo_path):
+    """Retourne le répertoire git commun (partagé par les worktrees) du dépôt."""
+    git_dir = run_git_command(repo_path, ['rev-parse', '--git-common-dir'], False) or '.git'
+    return git_dir if os.path.isabs(git_dir) else os.path.join(repo_path, git_dir)
+
+# Version du format du cache local: un cache d'une autre version est reconstruit
+COMMIT_CACHE_VERSION = 1
+
+def commit_to_row(commit, files):
+    """Sérialise un commit et son numstat en ligne du cache."""
+    return {
+        'h': commit['hash'],
+        'an': commit['author_name'],
+        'ae': commit['author_email'],
+        't': commit['timestamp'],
+        'd': commit.get('date_iso', ''),
+        's': commit['message'],
+        'f': [list(f) for f in files]
+    }
+
+def row_to_commit(row):
+    """Reconstruit un commit (au format de get_commits) depuis une ligne du cache."""
+    return {
+        'hash': row['h'],
+        'author_name': row['an'],
+        'author_email': row['ae'],
+        'timestamp': row['t'],
+        'datetime': datetime.datetime.fromtimestamp(row['t']),
+        'message': row['s'],
+        'date_iso': row['d'],
+        'files': [tuple(f) for f in row['f']]
+    }
+
+class CacheRollups:
+    """Agrégats du cache pour un seuil de session, tenus à jour commit par commit par les hooks.
+
+    - <ref>.rollups-<seuil>.json: petit état réécrit à chaque commit (tip, cumuls des
+      sessions fermées, session ouverte, jour en cours);
+    - <ref>.rollups-<seuil>.days.jsonl: incréments par jour (jour terminé, session
+      fermée) ajoutés à la fin et additionnés à la lecture.
+    Un commit coûte donc un temps constant. Les commits sont supposés arriver dans
+    l'ordre chronologique; un commit plus ancien que la fin de la session ouverte y est rattaché.
+    """
+
+    VERSION = 2
+
+    def __init__(self, directory, name, threshold=3.0):
+        self.threshold = threshold
+        base = os.path.join(directory, f"{name}.rollups-{threshold:g}")
+        self.path = base + '.json'
+        self.days_path = base + '.days.jsonl'
+        self.reset(None)
+
+    @classmethod
+    def existing(cls, directory, name):
+        """Agrégats déjà présents pour cette référence, un par seuil."""
+        if not os.path.isdir(directory):
+            return []
+        pattern = re.compile(re.escape(name) + r'\.rollups-(\d+(?:\.\d+)?)\.json')
+        matches = (pattern.fullmatch(f) for f in os.listdir(directory))
+        return [cls(directory, name, float(m.group(1))).load() for m in matches if m]
+
+    def reset(self, tip):
+        self.tip = tip
+        self.closed_sessions = 0
+        self.closed_hours = 0.0
+        self.open_session = None
+        self.current_day = None
+        self.days_size = 0
+        self.increments = []
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and data.get('threshold') == self.threshold:
+                self.tip = data['tip']
+                self.closed_sessions = data['closed_sessions']
+                self.closed_hours = data['closed_hours']
+                self.open_session = data['open_session']
+                self.current_day = data['current_day']
+                self.days_size = data['days_size']
+        return self
+
+    def add(self, commit, files):
+        """Intègre un commit en temps constant."""
+        timestamp = commit['timestamp']
+        day = commit['datetime'].strftime('%Y-%m-%d')
+        session = self.open_session
+        if session and timestamp - session['end'] <= self.threshold * 3600:
+            session['end'] = max(session['end'], timestamp)
+            session['commits'] += 1
+        else:
+            if session:
+                hours = self.session_hours(session)
+                self.closed_sessions += 1
+                self.closed_hours += hours
+                # Les heures d'une session sont comptées le jour de son début
+                self.increments.append({'day': session['day'], 'hours': hours})
+            self.open_session = {'start': timestamp, 'end': timestamp, 'commits': 1, 'day': day}
+
+        if self.current_day and self.current_day['day'] != day:
+            self.increments.append(self.current_day)
+            self.current_day = None
+        if not self.current_day:
+            self.current_day = {'day': day, 'commits': 0, 'changes': 0, 'files': 0}
+        stats = make_commit_stats(commit, files)
+        self.current_day['commits'] += 1
+        self.current_day['changes'] += stats['changes']
+        self.current_day['files'] += stats['files_changed']
+
+    def rebuild(self, commits, tip):
+        """Recalcule les agrégats depuis la table complète (triée par date)."""
+        self.reset(tip)
+        for commit in commits:
+            self.add(commit, commit['files'])
+        self.save()
+
+    @staticmethod
+    def session_hours(session):
+        return session_estimated_hours((session['end'] - session['start']) / 3600, session['commits'])
+
+    def sessions_count(self):
+        return self.closed_sessions + (1 if self.open_session else 0)
+
+    def total_hours(self):
+        return self.closed_hours + (self.session_hours(self.open_session) if self.open_session else 0)
+
+    def day_totals(self):
+        """Totaux par jour (commits, lignes, fichiers, heures des sessions commencées ce jour-là)."""
+        days = defaultdict(lambda: {'commits': 0, 'changes': 0, 'files': 0, 'hours': 0.0})
+        increments = []
+        if os.path.exists(self.days_path):
+            with open(self.days_path, 'rb') as f:
+                increments = [json.loads(line) for line in f.read(self.days_size).splitlines()]
+        if self.current_day:
+            increments.append(self.current_day)
+        if self.open_session:
+            increments.append({'day': self.open_session['day'], 'hours': self.session_hours(self.open_session)})
+        for increment in increments:
+            totals = days[increment['day']]
+            for key in totals:
+                totals[key] += increment.get(key, 0)
+        return dict(days)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.days_path, 'ab') as f:
+            # Écarter une fin d'écriture interrompue (ou tout le journal après un reset)
+            if f.tell() > self.days_size:
+                f.truncate(self.days_size)
+            for increment in self.increments:
+                f.write((json.dumps(increment) + '\n').encode('utf-8'))
+            self.days_size = f.tell()
+        self.increments = []
+
+        data = {'version': self.VERSION, 'threshold': self.threshold, 'tip': self.tip,
+                'closed_sessions': self.closed_sessions, 'closed_hours': self.closed_hours,
+                'open_session': self.open_session, 'current_day': self.current_day, 'days_size': self.days_size}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+class CommitCache:
+    """Table des commits d'une référence (métadonnées et numstat) dans .git/git-time/cache/.
+
+    Les lignes sont ajoutées à la fin d'un fichier JSONL; le fichier meta
+    indique le dernier commit intégré (tip), le nombre de lignes valides et leur
+    taille en octets. Les hooks (git-time install-hooks) y ajoutent les nouveaux
+    commits au fil de l'eau, mettent à jour les agrégats (CacheRollups) et signalent
+    les réécritures dans `rewritten`.
+    """
+
+    def __init__(self, repo_path, branch=None):
+        self.repo_path = repo_path
+        self.rev = branch or 'HEAD'
+        self.ref = run_git_command(repo_path, ['rev-parse', '--symbolic-full-name', self.rev], False) or self.rev
+        self.directory = os.path.join(get_git_dir(repo_path), 'git-time', 'cache')
+        self.name = re.sub(r'[^A-Za-z0-9._-]', '_', self.ref)
+        self.rows_path = os.path.join(self.directory, f"{self.name}.jsonl")
+        self.meta_path = os.path.join(self.directory, f"{self.name}.meta.json")
+        self.commits = []
+        self.by_hash = {}
+        self.tip = None
+        self.stale_tail = False
+
+    def read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta if meta.get('version') == COMMIT_CACHE_VERSION else None
+
+    def write_meta(self, count, rewritten=None):
+        meta = {'version': COMMIT_CACHE_VERSION, 'ref': self.ref, 'tip': self.tip, 'count': count,
+                'size': os.path.getsize(self.rows_path) if os.path.exists(self.rows_path) else 0}
+        if rewritten is not None:
+            meta['rewritten'] = rewritten
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def load(self, count):
+        """Charge les `count` premières lignes (une fin d'écriture interrompue est ignorée)."""
+        self.commits = []
+        self.stale_tail = False
+        with open(self.rows_path, encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if i >= count:
+                    self.stale_tail = True
+                    break
+                self.commits.append(row_to_commit(json.loads(line)))
+
+    def append(self, entries, rewrite=False):
+        """Ajoute des (commit, fichiers) à la fin du cache."""
+        os.makedirs(self.directory, exist_ok=True)
+        if rewrite or self.stale_tail:
+            with open(self.rows_path, 'w', encoding='utf-8') as f:
+                for commit in self.commits:
+                    f.write(json.dumps(commit_to_row(commit, commit['files']), ensure_ascii=False) + '\n')
+            self.stale_tail = False
+        with open(self.rows_path, 'a', encoding='utf-8') as f:
+            for commit, files in entries:
+                f.write(json.dumps(commit_to_row(commit, files), ensure_ascii=False) + '\n')
+                self.commits.append(dict(commit, files=files))
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Verrou exclusif entre les rapports et les hooks lancés en arrière-plan."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def update(self, verbose=False):
+        """Met le cache à jour: rien si le tip n'a pas bougé, sinon seulement les nouveaux commits."""
+        with self.locked():
+            return self.finish(self.catch_up(verbose), verbose)
+
+    def catch_up(self, verbose=False):
+        self.tip = run_git_command(self.repo_path, ['rev-parse', f"{self.rev}^{{commit}}"], False)
+        meta = self.read_meta()
+
+        if meta and os.path.exists(self.rows_path):
+            self.load(meta['count'])
+            base = meta['tip']
+            rewrite = False
+            if 'rewritten' in meta:
+                # Réécriture signalée par un hook: garder les lignes antérieures au premier commit réécrit
+                rewritten = set(meta['rewritten']) | {base}
+                keep = next((i for i, c in enumerate(self.commits) if c['hash'] in rewritten), len(self.commits))
+                self.commits = self.commits[:keep]
+                base = self.commits[-1]['hash'] if self.commits else None
+                rewrite = True
+            if base == self.tip and not rewrite:
+                return 0
+            if base and self.tip and is_ancestor_commit(self.repo_path, base, self.tip):
+                known = {c['hash'] for c in self.commits}
+                new_entries = [(c, f) for c, f in stream_log_numstat(self.repo_path, [f"{base}..{self.tip}"])
+                               if c['hash'] not in known]
+                count = run_git_command(self.repo_path, ['rev-list', '--count', self.tip], False)
+                if not rewrite or count == str(len(self.commits) + len(new_entries)):
+                    self.append(reversed(new_entries), rewrite)
+                    self.write_meta(len(self.commits))
+                    return len(new_entries)
+
+        # Pas de cache, ou historique réécrit: reconstruction complète
+        self.commits = []
+        if not self.tip:
+            return 0
+        entries = list(stream_log_numstat(self.repo_path, [self.tip], verbose))
+        self.append(reversed(entries), rewrite=True)
+        self.write_meta(len(self.commits))
+        return len(entries)
+
+    def finish(self, added, verbose):
+        self.commits.sort(key=lambda x: x['timestamp'])
+        self.by_hash = {c['hash']: c for c in self.commits}
+        if verbose:
+            print_info(f"Cache {self.ref}: {len(self.commits)} commits ({added} nouveaux)", indent=2)
+        return added
+
+    def advance(self):
+        """Ajoute les nouveaux commits sans relire la table (hooks post-commit et post-merge).
+
+        Le coût ne dépend que du nombre de nouveaux commits. Si l'ancien tip n'est
+        plus un ancêtre, le cache est seulement marqué pour une reconstruction
+        différée au prochain rapport.
+        """
+        with self.locked():
+            meta = self.read_meta()
+            if not meta or 'rewritten' in meta or not os.path.exists(self.rows_path):
+                return 0
+            self.tip = run_git_command(self.repo_path, ['rev-parse', f"{self.rev}^{{commit}}"], False)
+            if not self.tip or meta['tip'] == self.tip:
+                return 0
+            if not is_ancestor_commit(self.repo_path, meta['tip'], self.tip):
+                self.tip = meta['tip']
+                self.write_meta(meta['count'], [])
+                return 0
+
+            entries = list(stream_log_numstat(self.repo_path, [f"{meta['tip']}..{self.tip}"]))
+            entries.reverse()
+            with open(self.rows_path, 'ab') as f:
+                # Écarter une fin d'écriture interrompue
+                if 'size' in meta and f.tell() > meta['size']:
+                    f.truncate(meta['size'])
+                for commit, files in entries:
+                    f.write((json.dumps(commit_to_row(commit, files), ensure_ascii=False) + '\n').encode('utf-8'))
+
+            # Agrégats à jour: les prolonger; les autres seront reconstruits au prochain rapport
+            for rollups in CacheRollups.existing(self.directory, self.name):
+                if rollups.tip == meta['tip']:
+                    for commit, files in entries:
+                        rollups.add(commit, files)
+                    rollups.tip = self.tip
+                    rollups.save()
+            self.write_meta(meta['count'] + len(entries))
+            return len(entries)
+
+    def rollups(self, threshold=3.0):
+        """Agrégats du seuil demandé, reconstruits depuis la table s'ils ne sont pas à jour."""
+        with self.locked():
+            rollups = CacheRollups(self.directory, self.name, threshold).load()
+            if rollups.tip != self.tip:
+                rollups.rebuild(self.commits, self.tip)
+            return rollups
+
+    def mark_rewritten(self, hashes):
+        """Signale des commits réécrits (hook post-rewrite): la table sera corrigée au prochain rapport."""
+        with self.locked():
+            meta = self.read_meta()
+            if not meta:
+                return
+            self.tip = meta['tip']
+            self.write_meta(meta['count'], sorted(set(meta.get('rewritten', [])) | set(hashes)))
+
+    # Interface des caches de statistiques (voir fetch_numstat)
+    def lookup(self, hashes):
+        return {h: self.by_hash[h]['files'] for h in hashes if h in self.by_hash}
+
+    def store(self, numstat):
+        pass
+
+    def flush(self, verbose=False):
+        pass
+
+def default_global_cache_dir():
+    """Répertoire du cache utilisateur (XDG_CACHE_HOME ou ~/.cache)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'git-time', 'objects')
+
+class GlobalStatsCache:
+    """Cache utilisateur des commits (métadonnées et numstat), adressé par SHA et partagé entre clones.
+
+    256 fragments (deux premiers caractères du SHA), chacun composé de:
+    - XX.dat: enregistrements JSON ajoutés à la fin
+    - XX.idx: entrées triées de taille fixe (SHA, position, longueur, dernier accès),
+      lues par recherche dichotomique dans un mmap
+    L'éviction LRU supprime les commits les moins récemment utilisés au-delà de `max_bytes`.
+    """
+
+    INDEX_MAGIC = b'GTIX'
+    INDEX_VERSION = 1
+    INDEX_HEADER = struct.Struct('>4sII')
+    INDEX_ENTRY = struct.Struct('>20sQII')
+    # Précision du « dernier accès »: évite de réécrire les index à chaque lecture
+    ATIME_RESOLUTION = 3600
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        self.directory = directory or default_global_cache_dir()
+        self.max_bytes = max_bytes
+        self.maps = {}
+        self.pending = {}
+        self.touched = defaultdict(set)
+        self.known = {}
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def describe(self, commits):
+        """Fournit les métadonnées des commits à enregistrer avec leur numstat."""
+        self.known.update((c['hash'], c) for c in commits)
+
+    def shard_paths(self, shard):
+        return os.path.join(self.directory, f"{shard}.dat"), os.path.join(self.directory, f"{shard}.idx")
+
+    def index_map(self, shard):
+        """Retourne le mmap de l'index d'un fragment (ou None s'il est vide)."""
+        if shard not in self.maps:
+            self.maps[shard] = None
+            _, idx_path = self.shard_paths(shard)
+            if os.path.exists(idx_path) and os.path.getsize(idx_path) > self.INDEX_HEADER.size:
+                with open(idx_path, 'rb') as f:
+                    index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, _ = self.INDEX_HEADER.unpack_from(index, 0)
+                if magic == self.INDEX_MAGIC and version == self.INDEX_VERSION:
+                    self.maps[shard] = index
+        return self.maps[shard]
+
+    def find(self, commit_hash):
+        """Recherche dichotomique dans l'index: (position, longueur, dernier accès) ou None."""
+        if len(commit_hash) != 40:
+            return None
+        index = self.index_map(commit_hash[:2])
+        if index is None:
+            return None
+        key = bytes.fromhex(commit_hash)
+        _, _, count = self.INDEX_HEADER.unpack_from(index, 0)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            sha, offset, length, atime = self.INDEX_ENTRY.unpack_from(index, self.INDEX_HEADER.size + middle * self.INDEX_ENTRY.size)
+            if sha < key:
+                low = middle + 1
+            elif sha > key:
+                high = middle
+            else:
+                return offset, length, atime
+        return None
+
+    def contains(self, commit_hash):
+        return self.find(commit_hash) is not None
+
+    def lookup(self, hashes):
+        found = {}
+        now = int(time.time())
+        for commit_hash in hashes:
+            entry = self.find(commit_hash)
+            if entry is None:
+                self.misses += 1
+                continue
+            offset, length, atime = entry
+            dat_path, _ = self.shard_paths(commit_hash[:2])
+            with open(dat_path, 'rb') as f:
+                f.seek(offset)
+                row = json.loads(f.read(length))
+            found[commit_hash] = [tuple(x) for x in row['f']]
+            self.hits += 1
+            if now - atime > self.ATIME_RESOLUTION:
+                self.touched[commit_hash[:2]].add(commit_hash)
+        return found
+
+    def store(self, numstat):
+        for commit_hash, files in numstat.items():
+            if len(commit_hash) == 40:
+                self.pending[commit_hash] = files
+
+    def read_entries(self, shard):
+        index = self.index_map(shard)
+        if index is None:
+            return []
+        _, _, count = self.INDEX_HEADER.unpack_from(index, 0)
+        return [self.INDEX_ENTRY.unpack_from(index, self.INDEX_HEADER.size + i * self.INDEX_ENTRY.size) for i in range(count)]
+
+    def write_index(self, shard, entries):
+        _, idx_path = self.shard_paths(shard)
+        entries.sort(key=lambda e: e[0])
+        tmp_path = idx_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, self.INDEX_VERSION, len(entries)))
+            for entry in entries:
+                f.write(self.INDEX_ENTRY.pack(*entry))
+        if self.maps.get(shard) is not None:
+            self.maps[shard].close()
+        self.maps.pop(shard, None)
+        os.replace(tmp_path, idx_path)
+
+    def flush(self, verbose=False):
+        """Ajoute les nouveaux enregistrements, met à jour les index puis applique l'éviction."""
+        if not self.pending and not self.touched:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Relire les index: un autre processus a pu écrire entre-temps
+            for index in self.maps.values():
+                if index is not None:
+                    index.close()
+            self.maps = {}
+
+            now = int(time.time())
+            by_shard = defaultdict(dict)
+            for commit_hash, files in self.pending.items():
+                by_shard[commit_hash[:2]][commit_hash] = files
+
+            for shard in set(by_shard) | set(self.touched):
+                entries = {sha: [sha, offset, length, atime] for sha, offset, length, atime in self.read_entries(shard)}
+                for commit_hash in self.touched.get(shard, ()):
+                    key = bytes.fromhex(commit_hash)
+                    if key in entries:
+                        entries[key][3] = now
+
+                dat_path, _ = self.shard_paths(shard)
+                with open(dat_path, 'ab') as f:
+                    for commit_hash, files in by_shard.get(shard, {}).items():
+                        key = bytes.fromhex(commit_hash)
+                        if key in entries:
+                            continue
+                        commit = self.known.get(commit_hash)
+                        row = commit_to_row(commit, files) if commit else {'h': commit_hash, 'f': [list(x) for x in files]}
+                        data = json.dumps(row, ensure_ascii=False).encode('utf-8')
+                        offset = f.tell()
+                        f.write(data + b'\n')
+                        entries[key] = [key, offset, len(data), now]
+                        self.stored += 1
+                self.write_index(shard, list(entries.values()))
+
+            self.pending = {}
+            self.touched = defaultdict(set)
+            self.evict()
+
+        if verbose and self.stored:
+            print_info(f"{self.stored} commits ajoutés au cache global ({self.directory})", indent=2)
+
+    def size(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.directory, f)) for f in os.listdir(self.directory)
+                   if f.endswith('.dat') or f.endswith('.idx'))
+
+    def evict(self):
+        """Supprime les commits les moins récemment utilisés jusqu'à 80% de la taille maximale."""
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        candidates = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.idx'):
+                shard = name[:-4]
+                candidates.extend((atime, length, shard, sha) for sha, _, length, atime in self.read_entries(shard))
+        candidates.sort()
+
+        doomed = defaultdict(set)
+        target = self.max_bytes * 0.8
+        for atime, length, shard, sha in candidates:
+            if total <= target:
+                break
+            doomed[shard].add(sha)
+            total -= length + 1 + self.INDEX_ENTRY.size
+
+        # Compacter les fragments concernés
+        for shard, shas in doomed.items():
+            dat_path, _ = self.shard_paths(shard)
+            kept = []
+            with open(dat_path, 'rb') as old, open(dat_path + '.tmp', 'wb') as new:
+                for sha, offset, length, atime in self.read_entries(shard):
+                    if sha in shas:
+                        continue
+                    old.seek(offset)
+                    data = old.read(length)
+                    kept.append([sha, new.tell(), length, atime])
+                    new.write(data + b'\n')
+            os.replace(dat_path + '.tmp', dat_path)
+            self.write_index(shard, kept)
+            self.evicted += len(shas)
+
+    def print_stats(self):
+        """Affiche le rapport --cache-stats."""
+        print_subheader("CACHE GLOBAL DES STATISTIQUES")
+        requests = self.hits + self.misses
+        print_value("Répertoire", self.directory, indent=2)
+        print_value("Succès / échecs", f"{self.hits} / {self.misses}", indent=2)
+        print_value("Taux de succès", f"{100 * self.hits / requests:.1f}%" if requests else "n/a", indent=2)
+        print_value("Commits ajoutés", self.stored, indent=2)
+        print_value("Commits évincés (LRU)", self.evicted, indent=2)
+        print_value("Taille", f"{self.size() / (1024 * 1024):.2f} / {self.max_bytes / (1024 * 1024):.0f}", "Mio", indent=2)
+
+def fetch_numstat(repo_path, hashes, stores=()):
+    """Numstat des commits: lu dans les caches (`stores`) puis calculé pour le reste."""
+    result = {}
+    missing = list(hashes)
+    found_by = []
+    for store in stores:
+        found = store.lookup(missing) if missing else {}
+        result.update(found)
+        missing = [h for h in missing if h not in found]
+        found_by.append((store, found))
+
+    if missing:
+        result.update(get_numstat_batch(repo_path, missing))
+
+    # Compléter chaque cache avec ce qu'il n'a pas fourni lui-même, même s'il n'a pas été
+    # consulté (les caches ignorent à l'écriture les commits qu'ils contiennent déjà)
+    for store, found in found_by:
+        backfill = {h: files for h, files in result.items() if h not in found}
+        if backfill:
+            store.store(backfill)
+    return result
+
+def fetch_commits_numstat(repo_path, commits, stores=(), submodule_stores=None):
+    """Numstat d'un lot de commits, chacun résolu dans son dépôt.
+
+    Les commits des sous-modules (clé 'repo') sont lus dans le sous-module avec les caches
+    que lui associe `submodule_stores` ({nom: (chemin, caches)}), ceux du dépôt principal
+    avec `stores`.
+    """
+    by_repo = defaultdict(list)
+    for commit in commits:
+        by_repo[commit.get('repo', '.')].append(commit['hash'])
+
+    result = {}
+    for name, hashes in by_repo.items():
+        if submodule_stores and name in submodule_stores:
+            path, repo_stores = submodule_stores[name]
+            result.update(fetch_numstat(path, hashes, repo_stores))
+        else:
+            result.update(fetch_numstat(repo_path, hashes, stores))
+    return result
+
+def collect_commit_stats(repo_path, commits, verbose=False, stores=()):
+    """Récupère les statistiques (fichiers, lignes) de chaque commit par lots."""
+    commit_stats = []
+    total = len(commits)
+
+    for start in range(0, total, NUMSTAT_BATCH_SIZE):
+        batch = commits[start:start + NUMSTAT_BATCH_SIZE]
+        numstat = fetch_numstat(repo_path, [c['hash'] for c in batch], stores)
+        for commit in batch:
+            if commit['hash'] in numstat:
+                commit_stats.append(make_commit_stats(commit, numstat[commit['hash']]))
+
+        if verbose and total > NUMSTAT_BATCH_SIZE:
+            done = min(start + NUMSTAT_BATCH_SIZE, total)
+            print_progress_bar(done, total,
+                             prefix='  Statistiques:',
+                             suffix=f'({done}/{total})',
+                             length=30)
+
+    return commit_stats
+
+def collect_activity_rollup(repo_path, commits, verbose=False, stores=(), checkpoint=None, submodule_stores=None):
+    """Totaux de l'analyse d'activité (lignes, fichiers, tailles), calculés par lots.
+
+    Avec un `checkpoint`, les totaux partiels sont enregistrés après chaque lot
+    et une analyse interrompue reprend au dernier lot traité.
+    """
+    total = len(commits)
+    rollup = {'position': 0, 'last_hash': None, 'count': 0, 'changes': 0, 'files': 0,
+              'sizes': [0] * len(COMMIT_SIZE_BUCKETS)}
+
+    state = checkpoint.get('activity', commits) if checkpoint else None
+    if state:
+        rollup = state
+        if verbose:
+            print_info(f"Reprise des statistiques au commit {rollup['position']}/{total}", indent=2)
+
+    for start in range(rollup['position'], total, NUMSTAT_BATCH_SIZE):
+        batch = commits[start:start + NUMSTAT_BATCH_SIZE]
+        numstat = fetch_commits_numstat(repo_path, batch, stores, submodule_stores)
+        for commit in batch:
+            if commit['hash'] in numstat:
+                stats = make_commit_stats(commit, numstat[commit['hash']])
+                rollup['count'] += 1
+                rollup['changes'] += stats['changes']
+                rollup['files'] += stats['files_changed']
+                rollup['sizes'][classify_commit_size(stats['changes'])] += 1
+
+        rollup['position'] = start + len(batch)
+        rollup['last_hash'] = batch[-1]['hash']
+        if checkpoint:
+            checkpoint.update('activity', dict(rollup, sizes=list(rollup['sizes'])))
+
+        if verbose and total > NUMSTAT_BATCH_SIZE:
+            done = rollup['position']
+            print_progress_bar(done, total,
+                             prefix='  Statistiques:',
+                             suffix=f'({done}/{total})',
+                             length=30)
+
+    return rollup
+
+# Arguments dont dépend le résultat: une reprise exige qu'ils soient identiques
+CHECKPOINT_ARGUMENTS = ('author', 'since', 'until', 'branch', 'threshold', 'max_commits', 'where', 'dedupe_patches',
+                        'recurse_submodules')
+
+class AnalysisCheckpoint:
+    """Point de reprise d'une analyse détaillée (.git/git-time/checkpoint.json).
+
+    Chaque phase (aujourd'hui 'activity', la collecte du numstat) enregistre sa
+    position, le hash du dernier commit traité et ses totaux partiels. La reprise n'est acceptée que si les
+    arguments sont identiques et que l'ancien commit de tête est un ancêtre du
+    commit de tête actuel (historique non réécrit).
+    """
+
+    VERSION = 1
+
+    def __init__(self, repo_path, signature, tip, interval=30):
+        self.repo_path = repo_path
+        self.path = os.path.join(get_git_dir(repo_path), 'git-time', 'checkpoint.json')
+        self.signature = signature
+        self.tip = tip
+        self.interval = interval
+        self.phases = {}
+        self.last_save = time.time()
+        self.saving = False
+
+    def resume(self, verbose=False):
+        """Charge le point de reprise s'il est compatible avec le dépôt et les arguments."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            print_info("Aucun point de reprise, analyse complète.", indent=2)
+            return False
+
+        if saved.get('version') != self.VERSION or saved.get('signature') != self.signature:
+            print_warning("Point de reprise ignoré: arguments différents de l'analyse interrompue.", indent=2)
+            return False
+        if saved['tip'] != self.tip and not (self.tip and is_ancestor_commit(self.repo_path, saved['tip'], self.tip)):
+            print_warning("Point de reprise ignoré: l'historique a été réécrit depuis.", indent=2)
+            return False
+
+        self.phases = saved.get('phases', {})
+        if verbose:
+            saved_at = datetime.datetime.fromtimestamp(saved['saved_at']).strftime('%Y-%m-%d %H:%M:%S')
+            print_success(f"Reprise de l'analyse enregistrée le {saved_at}", indent=2)
+        return True
+
+    def get(self, phase, commits):
+        """État enregistré d'une phase, s'il correspond toujours à la liste des commits."""
+        state = self.phases.get(phase)
+        if not state:
+            return None
+        position = state['position']
+        if not 0 < position <= len(commits) or commits[position - 1]['hash'] != state['last_hash']:
+            return None
+        return state
+
+    def update(self, phase, state):
+        self.phases[phase] = state
+        if time.time() - self.last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        if not self.phases:
+            return
+        self.saving = True
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = {'version': self.VERSION, 'signature': self.signature, 'tip': self.tip,
+                    'saved_at': time.time(), 'phases': self.phases}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self.last_save = time.time()
+        finally:
+            self.saving = False
+
+    def install_signal_handlers(self):
+        """Enregistre le point de reprise sur Ctrl-C ou SIGTERM (timeout de CI) avant d'interrompre."""
+        def interrupt(signum, frame):
+            if not self.saving:
+                self.save()
+                if self.phases:
+                    print_info("\nPoint de reprise enregistré: relancez avec --resume pour continuer.")
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGINT, interrupt)
+        signal.signal(signal.SIGTERM, interrupt)
+
+    def clear(self):
+        self.phases = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def parse_sample_spec(spec):
+    """Interprète --sample: un taux (0.1 ou 10%) ou un nombre de commits (500)."""
+    spec = spec.strip()
+    if re.fullmatch(r'\d+', spec):
+        count = int(spec)
+        if count <= 0:
+            raise ValueError(f"taille d'échantillon invalide: {spec}")
+        return None, count
+
+    rate = float(spec[:-1]) / 100 if spec.endswith('%') else float(spec)
+    if not 0 < rate <= 1:
+        raise ValueError(f"taux d'échantillonnage invalide: {spec}")
+    return rate, None
+
+def build_sample_strata(commits, seed=None):
+    """Répartit les commits en strates (mois, auteur) mélangées aléatoirement."""
+    rng = random.Random(seed)
+    strata = defaultdict(list)
+    for commit in commits:
+        key = (commit['datetime'].strftime('%Y-%m'), commit['author_email'].lower())
+        strata[key].append(commit)
+
+    # Un préfixe de chaque strate mélangée est un tirage aléatoire simple
+    for members in strata.values():
+        rng.shuffle(members)
+    return strata
+
+def allocate_sample(strata, target, taken):
+    """Allocation proportionnelle de `target` commits au total, sans jamais le dépasser.
+
+    Tant que le budget le permet, chaque strate reçoit un commit (les plus grandes
+    d'abord); le reste va aux strates les plus en deçà de leur quota proportionnel.
+    """
+    total = sum(len(members) for members in strata.values())
+    allocation = {key: min(len(members), taken.get(key, 0)) for key, members in strata.items()}
+    budget = target - sum(allocation.values())
+
+    for key in sorted(strata, key=lambda k: len(strata[k]), reverse=True):
+        if budget <= 0:
+            break
+        if allocation[key] == 0:
+            allocation[key] = 1
+            budget -= 1
+
+    # Plus grand déficit par rapport au quota proportionnel d'abord
+    heap = [(allocation[key] - target * len(members) / total, i, key)
+            for i, (key, members) in enumerate(strata.items()) if allocation[key] < len(members)]
+    heapq.heapify(heap)
+    while budget > 0 and heap:
+        _, i, key = heapq.heappop(heap)
+        allocation[key] += 1
+        budget -= 1
+        if allocation[key] < len(strata[key]):
+            heapq.heappush(heap, (allocation[key] - target * len(strata[key]) / total, i, key))
+    return allocation
+
+def estimate_from_sample(strata, taken, stats_by_hash, z=1.96):
+    """Extrapole les totaux et l'histogramme des tailles avec intervalles de confiance."""
+    metrics = [('changes', lambda s: s['changes']), ('files', lambda s: s['files_changed'])]
+    for i in range(len(COMMIT_SIZE_BUCKETS)):
+        metrics.append((i, lambda s, i=i: 1 if classify_commit_size(s['changes']) == i else 0))
+
+    samples = {}
+    for key, members in strata.items():
+        sampled = [stats_by_hash[c['hash']] for c in members[:taken.get(key, 0)] if c['hash'] in stats_by_hash]
+        samples[key] = sampled
+
+    estimates = {}
+    for name, value_of in metrics:
+        # Variance globale, utilisée pour les strates à un seul commit échantillonné
+        all_values = [value_of(s) for sampled in samples.values() for s in sampled]
+        pooled_mean = sum(all_values) / len(all_values) if all_values else 0.0
+        pooled_var = 0.0
+        if len(all_values) > 1:
+            pooled_var = sum((v - pooled_mean) ** 2 for v in all_values) / (len(all_values) - 1)
+
+        total = 0.0
+        variance = 0.0
+        for key, members in strata.items():
+            values = [value_of(s) for s in samples[key]]
+            size, n = len(members), len(values)
+            if n == 0:
+                # Strate non échantillonnée (échantillon plus petit que le nombre de strates):
+                # moyenne et variance de l'ensemble de l'échantillon
+                if all_values:
+                    total += size * pooled_mean
+                    variance += size * size * pooled_var * (1 + 1 / len(all_values))
+                continue
+            mean = sum(values) / n
+            if n > 1:
+                var = sum((v - mean) ** 2 for v in values) / (n - 1)
+            else:
+                var = pooled_var if size > 1 else 0.0
+            total += size * mean
+            variance += size * size * (1 - n / size) * var / n
+
+        margin = z * math.sqrt(variance)
+        estimates[name] = (total, max(0.0, total - margin), total + margin)
+
+    return estimates
+
+def collect_sampled_stats(repo_path, commits, rate=None, count=None, time_budget=None, seed=None, verbose=False, stores=(),
+                          submodule_stores=None):
+    """Calcule les statistiques sur un échantillon stratifié (mois, auteur) des commits."""
+    strata = build_sample_strata(commits, seed)
+    deadline = time.time() + time_budget if time_budget else None
+
+    if count is not None:
+        target = min(count, len(commits))
+    elif rate is not None:
+        target = math.ceil(rate * len(commits))
+    else:
+        target = 0
+
+    taken = {}
+    stats_by_hash = {}
+    first_round = True
+
+    while True:
+        allocation = allocate_sample(strata, target, taken)
+        pending = [(key, c) for key, members in strata.items() for c in members[taken.get(key, 0):allocation[key]]]
+
+        for start in range(0, len(pending), NUMSTAT_BATCH_SIZE):
+            if not first_round and time.time() >= deadline:
+                break
+            batch = pending[start:start + NUMSTAT_BATCH_SIZE]
+            numstat = fetch_commits_numstat(repo_path, [c for _, c in batch], stores, submodule_stores)
+            for key, commit in batch:
+                if commit['hash'] in numstat:
+                    stats_by_hash[commit['hash']] = make_commit_stats(commit, numstat[commit['hash']])
+                taken[key] = taken.get(key, 0) + 1
+
+        first_round = False
+        sampled = sum(taken.values())
+        if verbose:
+            print_info(f"Échantillon: {sampled}/{len(commits)} commits ({len(strata)} strates)", indent=2)
+
+        if deadline is None or time.time() >= deadline or sampled >= len(commits):
+            break
+        # Budget de temps restant: agrandir l'échantillon
+        target = max(target * 2, sampled + NUMSTAT_BATCH_SIZE)
+
+    return {
+        'estimates': estimate_from_sample(strata, taken, stats_by_hash),
+        'sampled': len(stats_by_hash),
+        'population': len(commits),
+        'strata': len(strata)
+    }
+
+def print_activity_analysis(repo_path, commits, verbose=False, sample=None, time_budget=None, sample_seed=None, stores=(),
+                            checkpoint=None, submodule_stores=None):
+    """Affiche l'analyse des lignes et fichiers modifiés (exacte ou estimée)."""
+    if sample is None and not time_budget:
+        print_subheader("ANALYSE DE L'ACTIVITÉ")
+        rollup = collect_activity_rollup(repo_path, commits, verbose, stores, checkpoint, submodule_stores)
+        if not rollup['count']:
+            return
+
+        # Calculer des statistiques sur les changements
+        total_changes = rollup['changes']
+        total_files = rollup['files']
+        avg_changes = total_changes / rollup['count']
+
+        print_value("Total de lignes modifiées", total_changes, indent=2)
+        print_value("Moyenne de lignes par commit", f"{avg_changes:.1f}", indent=2)
+        print_value("Total de fichiers touchés", total_files, indent=2)
+        print_value("Moyenne de fichiers par commit", f"{total_files/rollup['count']:.1f}", indent=2)
+
+        # Classifier les commits par taille
+        counts = rollup['sizes']
+        size_data = [(label, counts[i]) for i, (label, _, _) in enumerate(COMMIT_SIZE_BUCKETS)]
+
+        if any(count > 0 for _, count in size_data):
+            generate_chart(size_data, max(count for _, count in size_data), "Commits par taille (lignes modifiées)")
+        return
+
+    print_subheader("ANALYSE DE L'ACTIVITÉ (ESTIMATION PAR ÉCHANTILLONNAGE)")
+    rate, count = parse_sample_spec(sample) if sample else (None, None)
+    result = collect_sampled_stats(repo_path, commits, rate, count, time_budget, sample_seed, verbose, stores,
+                                   submodule_stores)
+    if result['sampled'] == 0:
+        return
+
+    estimates = result['estimates']
+    population = result['population']
+
+    def fmt(estimate, per_commit=False):
+        value, low, high = estimate
+        if per_commit:
+            value, low, high = value / population, low / population, high / population
+            return f"≈ {value:.1f} [{low:.1f} – {high:.1f}]"
+        return f"≈ {value:.0f} [{low:.0f} – {high:.0f}]"
+
+    print_warning("Valeurs estimées à partir d'un échantillon, intervalles de confiance à 95%", indent=2)
+    print_value("Échantillon", f"{result['sampled']}/{population} commits ({result['strata']} strates mois × auteur)", indent=2)
+    print_value("Total de lignes modifiées (estimé)", fmt(estimates['changes']), indent=2)
+    print_value("Moyenne de lignes par commit (estimée)", fmt(estimates['changes'], True), indent=2)
+    print_value("Total de fichiers touchés (estimé)", fmt(estimates['files']), indent=2)
+    print_value("Moyenne de fichiers par commit (estimée)", fmt(estimates['files'], True), indent=2)
+
+    size_data = [(label, int(round(estimates[i][0]))) for i, (label, _, _) in enumerate(COMMIT_SIZE_BUCKETS)]
+    if any(count > 0 for _, count in size_data):
+        generate_chart(size_data, max(count for _, count in size_data), "Commits par taille (estimation)")
+        for i, (label, _, _) in enumerate(COMMIT_SIZE_BUCKETS):
+            print_info(f"{label}: {fmt(estimates[i])}", indent=2)
+
+class CommitQueryIndex:
+    """Index secondaires sur la table des commits en cache pour évaluer --where sans git.
+
+    - auteur (nom ou email) -> plages de lignes consécutives
+    - horodatages triés -> recherche par intervalle (bisect)
+    - trigrammes des messages -> lignes candidates
+    - chemin -> lignes ayant modifié ce fichier (numstat)
+    """
+
+    def __init__(self, commits):
+        self.rows = sorted(commits, key=lambda x: x['timestamp'])
+        self.timestamps = [c['timestamp'] for c in self.rows]
+        self.author_ranges = defaultdict(list)
+        self.trigrams = defaultdict(set)
+        self.paths = defaultdict(set)
+
+        for row_id, commit in enumerate(self.rows):
+            for key in {commit['author_name'].lower(), commit['author_email'].lower()}:
+                ranges = self.author_ranges[key]
+                if ranges and ranges[-1][1] == row_id:
+                    ranges[-1][1] = row_id + 1
+                else:
+                    ranges.append([row_id, row_id + 1])
+
+            message = commit['message'].lower()
+            for i in range(len(message) - 2):
+                self.trigrams[message[i:i + 3]].add(row_id)
+
+            for path, _, _ in commit.get('files', ()):
+                self.paths[path].add(row_id)
+
+        self.sorted_paths = sorted(self.paths)
+
+    def all_rows(self):
+        return set(range(len(self.rows)))
+
+    def match_author(self, op, value):
+        value = value.lower()
+        if op == '=':
+            keys = [value] if value in self.author_ranges else []
+        else:
+            keys = [k for k in self.author_ranges if value in k]
+        result = set()
+        for key in keys:
+            for start, end in self.author_ranges[key]:
+                result.update(range(start, end))
+        return result
+
+    def match_message(self, op, value):
+        value = value.lower()
+        if len(value) >= 3:
+            postings = [self.trigrams.get(value[i:i + 3], set()) for i in range(len(value) - 2)]
+            candidates = set.intersection(*sorted(postings, key=len))
+        else:
+            candidates = self.all_rows()
+        if op == '=':
+            return {i for i in candidates if self.rows[i]['message'].lower() == value}
+        return {i for i in candidates if value in self.rows[i]['message'].lower()}
+
+    def match_path(self, op, value):
+        result = set()
+        if op == '=' and not value.endswith('/'):
+            return set(self.paths.get(value, ()))
+        if op == '=':
+            # Répertoire: tous les chemins de même préfixe, contigus dans la liste triée
+            start = bisect.bisect_left(self.sorted_paths, value)
+            for path in self.sorted_paths[start:]:
+                if not path.startswith(value):
+                    break
+                result.update(self.paths[path])
+            return result
+        for path in self.sorted_paths:
+            if value in path:
+                result.update(self.paths[path])
+        return result
+
+    def match_date(self, op, value):
+        start, end = parse_query_period(value)
+        if op == '=':
+            low, high = start, end
+        elif op in ('>=', '>'):
+            low, high = (start if op == '>=' else end), None
+        else:
+            low, high = None, (end if op == '<=' else start)
+        lo = 0 if low is None else bisect.bisect_left(self.timestamps, low)
+        hi = len(self.rows) if high is None else bisect.bisect_left(self.timestamps, high)
+        return set(range(lo, hi))
+
+    def evaluate(self, node):
+        """Évalue l'arbre d'une expression --where en ensemble de lignes."""
+        kind = node[0]
+        if kind == 'and':
+            return self.evaluate(node[1]) & self.evaluate(node[2])
+        if kind == 'or':
+            return self.evaluate(node[1]) | self.evaluate(node[2])
+        if kind == 'not':
+            return self.all_rows() - self.evaluate(node[1])
+        _, field, op, value = node
+        return getattr(self, f"match_{field}")(op, value)
+
+    def query(self, expression):
+        """Retourne les commits (ordre chronologique) qui satisfont l'expression."""
+        return [self.rows[i] for i in sorted(self.evaluate(parse_where(expression)))]
+
+def parse_query_period(value):
+    """Convertit AAAA, AAAA-MM, AAAA-QN ou AAAA-MM-JJ en intervalle [début, fin) d'horodatages locaux."""
+    match = re.fullmatch(r'(\d{4})(?:-(?:[Qq]([1-4])|(\d{1,2}))(?:-(\d{1,2}))?)?', value)
+    if not match or (match.group(2) and match.group(4)):
+        raise ValueError(f"date invalide: {value} (ex: 2024, 2024-Q2, 2024-05, 2024-05-17)")
+    try:
+        return period_bounds(match)
+    except ValueError:
+        raise ValueError(f"date invalide: {value}")
+
+def period_bounds(match):
+    """Calcule l'intervalle [début, fin) d'une date reconnue par parse_query_period."""
+    year = int(match.group(1))
+    if match.group(2):
+        month = (int(match.group(2)) - 1) * 3 + 1
+        start, end = datetime.datetime(year, month, 1), datetime.datetime(year + (month + 3 > 12), (month + 2) % 12 + 1, 1)
+    elif match.group(4):
+        start = datetime.datetime(year, int(match.group(3)), int(match.group(4)))
+        end = start + datetime.timedelta(days=1)
+    elif match.group(3):
+        month = int(match.group(3))
+        start, end = datetime.datetime(year, month, 1), datetime.datetime(year + (month == 12), month % 12 + 1, 1)
+    else:
+        start, end = datetime.datetime(year, 1, 1), datetime.datetime(year + 1, 1, 1)
+    return start.timestamp(), end.timestamp()
+
+# Champs et opérateurs acceptés par --where
+QUERY_FIELDS = {
+    'author': ('=', '~'),
+    'message': ('=', '~'),
+    'path': ('=', '~'),
+    'date': ('=', '>=', '<=', '>', '<')
+}
+QUERY_TOKEN = re.compile(r'''\s*(?:(?P<paren>[()])|(?P<field>[a-z]+)\s*(?P<op>>=|<=|=|~|>|<)\s*(?P<value>"(?:[^"\\]|\\.)*"|'[^']*'|[^\s()]+)|(?P<keyword>and|or|not)\b)''')
+
+def parse_where(expression):
+    """Analyse une expression --where en arbre (and/or/not, champ op valeur).
+
+    Exemple: message~websocket and (author~alice or author=bob@x.io) and date=2024-Q2
+    """
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = QUERY_TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"expression --where invalide près de: {expression[pos:pos + 20]!r}")
+        pos = match.end()
+        if match.group('paren'):
+            tokens.append((match.group('paren'), None))
+        elif match.group('keyword'):
+            tokens.append((match.group('keyword'), None))
+        else:
+            field, op, value = match.group('field'), match.group('op'), match.group('value')
+            if field not in QUERY_FIELDS or op not in QUERY_FIELDS[field]:
+                raise ValueError(f"condition invalide: {field}{op} (champs: {', '.join(QUERY_FIELDS)})")
+            if value[0] in '"\'' and (len(value) < 2 or value[-1] != value[0]):
+                raise ValueError(f"guillemet non fermé dans --where: {value}")
+            if value[0] in '"\'':
+                value = re.sub(r'\\(.)', r'\1', value[1:-1]) if value[0] == '"' else value[1:-1]
+            if field == 'date':
+                parse_query_period(value)
+            tokens.append(('term', (field, op, value)))
+        while pos < len(expression) and expression[pos].isspace():
+            pos += 1
+
+    def parse_or(i):
+        node, i = parse_and(i)
+        while i < len(tokens) and tokens[i][0] == 'or':
+            right, i = parse_and(i + 1)
+            node = ('or', node, right)
+        return node, i
+
+    def parse_and(i):
+        node, i = parse_not(i)
+        while i < len(tokens) and tokens[i][0] == 'and':
+            right, i = parse_not(i + 1)
+            node = ('and', node, right)
+        return node, i
+
+    def parse_not(i):
+        if i >= len(tokens):
+            raise ValueError("expression --where incomplète")
+        kind, value = tokens[i]
+        if kind == 'not':
+            node, i = parse_not(i + 1)
+            return ('not', node), i
+        if kind == '(':
+            node, i = parse_or(i + 1)
+            if i >= len(tokens) or tokens[i][0] != ')':
+                raise ValueError("parenthèse fermante manquante dans --where")
+            return node, i + 1
+        if kind == 'term':
+            return ('term',) + value, i + 1
+        raise ValueError(f"élément inattendu dans --where: {kind}")
+
+    node, i = parse_or(0)
+    if i != len(tokens):
+        raise ValueError(f"élément inattendu dans --where: {tokens[i][0]}")
+    return node
+
+def compute_patch_ids(repo_path, hashes):
+    """Calcule les patch-ids stables en un seul pipeline `git log -p | git patch-id --stable`."""
+    if not hashes:
+        return {}
+    log = subprocess.Popen(['git', '-C', repo_path, 'log', '--no-walk=unsorted', '--stdin', '-p',
+                            '--pretty=medium', '--no-color', '--no-ext-diff'],
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    patch_id = subprocess.Popen(['git', '-C', repo_path, 'patch-id', '--stable'],
+                                stdin=log.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    log.stdout.close()
+
+    # Écrire les commits dans un thread pour ne pas bloquer la lecture du pipeline
+    def feed():
+        try:
+            log.stdin.write(''.join(f"{h}\n" for h in hashes).encode())
+        finally:
+            log.stdin.close()
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+
+    result = {}
+    for line in patch_id.stdout:
+        parts = line.split()
+        if len(parts) == 2:
+            result[parts[1]] = parts[0]
+    writer.join()
+    stderr = patch_id.stderr.read()
+    if log.wait() != 0 or patch_id.wait() != 0:
+        raise GitStageError('patch-id', stderr.strip() or "échec de git log -p / git patch-id")
+    return result
+
+def dedupe_patches(repo_path, commits, verbose=False):
+    """Écarte les copies (cherry-pick, rebase) d'un même patch en gardant la plus ancienne.
+
+    Les patch-ids sont conservés dans .git/git-time/patch-ids.tsv pour ne
+    calculer que les nouveaux commits aux exécutions suivantes.
+    """
+    cache_path = os.path.join(get_git_dir(repo_path), 'git-time', 'patch-ids.tsv')
+    patch_ids = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    patch_ids[parts[0]] = parts[1]
+
+    missing = [c['hash'] for c in commits if c['hash'] not in patch_ids]
+    if verbose:
+        print_step("Déduplication des patchs", "🧬")
+        print_info(f"{len(commits) - len(missing)} patch-ids en cache, {len(missing)} à calculer", indent=2)
+
+    if missing:
+        computed = compute_patch_ids(repo_path, missing)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'a', encoding='utf-8') as f:
+            for commit_hash in missing:
+                # "-": pas de patch (merge, commit vide), inutile de recalculer
+                patch_ids[commit_hash] = computed.get(commit_hash, '-')
+                f.write(f"{commit_hash}\t{patch_ids[commit_hash]}\n")
+
+    seen = set()
+    kept = []
+    removed = []
+    for commit in commits:
+        patch = patch_ids.get(commit['hash'], '-')
+        if patch != '-' and patch in seen:
+            removed.append(commit)
+            continue
+        seen.add(patch)
+        kept.append(commit)
+
+    if verbose:
+        print_success(f"{len(removed)} copies de patchs écartées", indent=2)
+    return kept, removed
+
+def parse_rolling_windows(spec):
+    """Interprète --rolling (ex: "7d,28d" ou "2w") en liste de (libellé, jours)."""
+    windows = []
+    for item in spec.split(','):
+        item = item.strip().lower()
+        match = re.fullmatch(r'(\d+)([dw])', item)
+        if not match or int(match.group(1)) <= 0:
+            raise ValueError(f"fenêtre glissante invalide: {item} (ex: 7d, 28d, 4w)")
+        days = int(match.group(1)) * (7 if match.group(2) == 'w' else 1)
+        windows.append((item, days))
+    return windows
+
+def sliding_sum(values, window):
+    """Somme glissante sur `window` éléments, en O(len(values))."""
+    result = []
+    total = 0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        # Arrondi pour éviter la dérive des flottants (valeurs négatives infimes)
+        result.append(round(total, 9))
+    return result
+
+def compute_rolling_series(commits, time_estimate, windows, session_threshold=3):
+    """Séries journalières glissantes (heures estimées, commits) par auteur et au total."""
+    first_day = commits[0]['datetime'].date()
+    last_day = commits[-1]['datetime'].date()
+    days_count = (last_day - first_day).days + 1
+    dates = [first_day + datetime.timedelta(days=i) for i in range(days_count)]
+
+    # Agrégats journaliers: heures au jour de début de session, commits au jour du commit
+    daily = {}
+    def rollup(name, session_details, series_commits):
+        hours = [0.0] * days_count
+        counts = [0] * days_count
+        for details in session_details:
+            hours[(details['start'].date() - first_day).days] += details['estimated_hours']
+        for commit in series_commits:
+            counts[(commit['datetime'].date() - first_day).days] += 1
+        daily[name] = (hours, counts)
+
+    rollup('(tous)', time_estimate['session_details'], commits)
+    for author_name, (author_commits, _, estimate) in sorted(estimate_by_author(commits, session_threshold).items()):
+        rollup(author_name, estimate['session_details'], author_commits)
+
+    series = {}
+    for name, (hours, counts) in daily.items():
+        series[name] = {
+            label: {'hours': sliding_sum(hours, days), 'commits': sliding_sum(counts, days)}
+            for label, days in windows
+        }
+    return {'dates': dates, 'windows': [label for label, _ in windows], 'series': series}
+
+def sparkline(values):
+    """Représente une série de valeurs par une ligne de blocs Unicode."""
+    blocks = "▁▂▃▄▅▆▇█"
+    high = max(values) if values else 0
+    if high <= 0:
+        return blocks[0] * len(values)
+    return ''.join(blocks[min(len(blocks) - 1, int(v / high * (len(blocks) - 1) + 0.5))] for v in values)
+
+def print_rolling_series(rolling):
+    """Affiche les séries glissantes en sparklines sur les derniers jours."""
+    print_subheader("PRODUCTIVITÉ GLISSANTE")
+    width = max(10, min(terminal_width - 2, 80) - 30)
+    dates = rolling['dates'][-width:]
+    print_info(f"Heures estimées par fenêtre, du {dates[0].isoformat()} au {dates[-1].isoformat()}", indent=2)
+
+    label_width = min(20, max(len(name) for name in rolling['series']))
+    for name, windows in rolling['series'].items():
+        for label in rolling['windows']:
+            hours = windows[label]['hours'][-width:]
+            commits_count = windows[label]['commits'][-1]
+            print(f"  {Colors.CYAN}{name[:label_width].ljust(label_width)}{Colors.ENDC} {label.rjust(4)} "
+                  f"{Colors.GREEN}{sparkline(hours)}{Colors.ENDC} {Colors.YELLOW}{hours[-1]:.1f}h{Colors.ENDC} ({commits_count} commits)")
+
+def export_rolling_series(filename, rolling):
+    """Exporte les séries glissantes en CSV ou JSON (selon l'extension)."""
+    if filename.lower().endswith('.json'):
+        data = {
+            'dates': [d.isoformat() for d in rolling['dates']],
+            'windows': rolling['windows'],
+            'series': rolling['series']
+        }
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    else:
+        import csv
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Date', 'Auteur', 'Fenêtre', 'Heures estimées', 'Commits'])
+            for name, windows in rolling['series'].items():
+                for label in rolling['windows']:
+                    values = windows[label]
+                    for i, day in enumerate(rolling['dates']):
+                        writer.writerow([day.isoformat(), name, label, f"{values['hours'][i]:.2f}", values['commits'][i]])
+    print_info(f"Séries glissantes exportées vers {filename}")
+
+class CountMinSketch:
+    """Count-Min sketch: estimation (par excès) de compteurs en mémoire fixe."""
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.tables = [[0.0] * width for _ in range(depth)]
+
+    def add(self, key, value=1):
+        for row in range(self.depth):
+            self.tables[row][hash((row, key)) % self.width] += value
+
+    def estimate(self, key):
+        return min(self.tables[row][hash((row, key)) % self.width] for row in range(self.depth))
+
+class SpaceSaving:
+    """Algorithme Space-Saving pondéré: top-k des clés les plus lourdes en mémoire fixe."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.heap = []
+
+    def add(self, key, value=1):
+        """Ajoute `value` à `key`; retourne la clé évincée s'il y en a une."""
+        evicted = None
+        if key in self.counts:
+            self.counts[key] += value
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = value
+            self.errors[key] = 0
+        else:
+            # Retirer le minimum (les entrées périmées du tas sont ignorées)
+            while True:
+                count, candidate = heapq.heappop(self.heap)
+                if self.counts.get(candidate) == count:
+                    break
+            evicted = candidate
+            del self.counts[candidate]
+            del self.errors[candidate]
+            self.counts[key] = count + value
+            self.errors[key] = count
+
+        heapq.heappush(self.heap, (self.counts[key], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, k) for k, count in self.counts.items()]
+            heapq.heapify(self.heap)
+        return evicted
+
+    def top(self, n):
+        return sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:n]
+
+class HotspotIndex:
+    """Churn, fréquence, auteurs et temps de session par fichier.
+
+    Exact tant que le nombre de chemins reste sous `max_paths`, puis bascule
+    sur un Count-Min sketch (commits, heures) et un top-k Space-Saving
+    (churn) pour garder une mémoire constante.
+    """
+
+    def __init__(self, top_n, max_paths=100000):
+        self.top_n = top_n
+        self.max_paths = max_paths
+        self.exact = {}
+        self.approximate = False
+
+    def add(self, path, churn, author, hours):
+        if not self.approximate:
+            entry = self.exact.get(path)
+            if entry is None:
+                entry = self.exact[path] = [0, 0, 0.0, set()]
+            entry[0] += churn
+            entry[1] += 1
+            entry[2] += hours
+            entry[3].add(author)
+            if len(self.exact) > self.max_paths:
+                self.switch_to_sketches()
+            return
+
+        self.commits.add(path)
+        self.hours.add(path, hours)
+        evicted = self.churn.add(path, churn)
+        if evicted is not None:
+            self.authors.pop(evicted, None)
+        self.authors.setdefault(path, set()).add(author)
+
+    def switch_to_sketches(self):
+        """Convertit les compteurs exacts en structures de taille fixe."""
+        self.approximate = True
+        self.commits = CountMinSketch()
+        self.hours = CountMinSketch()
+        self.churn = SpaceSaving(max(10 * self.top_n, 1000))
+        self.authors = {}
+        for path, (churn, commits, hours, authors) in self.exact.items():
+            self.commits.add(path, commits)
+            self.hours.add(path, hours)
+            evicted = self.churn.add(path, churn)
+            if evicted is not None:
+                self.authors.pop(evicted, None)
+            self.authors[path] = authors
+        self.exact = {}
+
+    def top(self):
+        """Retourne les `top_n` fichiers par churn: (chemin, churn, commits, heures, auteurs)."""
+        if not self.approximate:
+            ranked = sorted(self.exact.items(), key=lambda x: x[1][0], reverse=True)[:self.top_n]
+            return [(path, e[0], e[1], e[2], len(e[3])) for path, e in ranked]
+        return [(path, churn, int(self.commits.estimate(path)), self.hours.estimate(path), len(self.authors.get(path, ())))
+                for path, churn in self.churn.top(self.top_n)]
+
+def print_hotspots(repo_path, time_estimate, sessions, top_n, max_paths=100000, author=None, since=None, until=None,
+                   branch=None, verbose=False):
+    """Affiche les fichiers qui concentrent le plus de churn et de temps de session."""
+    print_subheader(f"FICHIERS LES PLUS ACTIFS (TOP {top_n})")
+
+    # Part de la session attribuée à chaque commit
+    commit_hours = {}
+    for session, details in zip(sessions, time_estimate['session_details']):
+        share = details['estimated_hours'] / len(session)
+        for commit in session:
+            commit_hours[commit['hash']] = share
+
+    # Seuls les commits analysés comptent (--where, --quick, --dedupe-patches réduisent la sélection);
+    # leur numstat est déjà chargé s'ils viennent du cache local
+    analyzed = [commit for session in sessions for commit in session]
+    if all('files' in commit for commit in analyzed):
+        changes = ((commit, commit['files']) for commit in analyzed)
+    else:
+        changes = ((commit, files) for commit, files in
+                   stream_log_numstat(repo_path, build_log_filters(author, since, until, branch), verbose)
+                   if commit['hash'] in commit_hours)
+
+    index = HotspotIndex(top_n, max_paths)
+    for commit, files in changes:
+        hours = commit_hours[commit['hash']]
+        for path, insertions, deletions in files:
+            index.add(path, insertions + deletions, commit['author_email'].lower(), hours)
+
+    rows = index.top()
+    if not rows:
+        print_warning("Aucun fichier modifié trouvé.", indent=2)
+        return
+    if index.approximate:
+        print_warning(f"Plus de {max_paths} chemins: valeurs approchées (Count-Min / Space-Saving)", indent=2)
+
+    generate_chart([(path if len(path) <= 40 else '…' + path[-39:], churn) for path, churn, _, _, _ in rows],
+                   rows[0][1], "Lignes modifiées par fichier", width=30)
+    for path, churn, commits_count, hours, authors_count in rows:
+        print_info(f"{path}: {churn} lignes, {commits_count} commits, {hours:.1f}h de session, {authors_count} auteur(s)", indent=2)
+
+def print_category_breakdown(categories, tickets):
+    """Affiche les heures, commits et sessions par catégorie de commit et par ticket."""
+    print_subheader("RÉPARTITION PAR TYPE DE TRAVAIL")
+    ranked = sorted(categories.items(), key=lambda x: x[1]['hours'], reverse=True)
+    hours_data = [(category, round(entry['hours'], 1)) for category, entry in ranked]
+    generate_chart(hours_data, max(h for _, h in hours_data), "Heures estimées par catégorie")
+    for category, entry in ranked:
+        print_info(f"{category}: {entry['hours']:.2f}h, {entry['commits']} commits, {entry['sessions']} sessions", indent=2)
+
+    if tickets:
+        top_tickets = sorted(tickets.items(), key=lambda x: x[1]['hours'], reverse=True)[:10]
+        print(f"\n  {Colors.BOLD}Tickets ({len(tickets)} référencés){Colors.ENDC}")
+        for ticket, entry in top_tickets:
+            print_info(f"{ticket}: {entry['hours']:.2f}h, {entry['commits']} commits", indent=2)
+
+def print_submodule_breakdown(submodules, total_hours):
+    """Affiche les sous-totaux par dépôt (dépôt principal et sous-modules)."""
+    print_subheader("RÉPARTITION PAR SOUS-MODULE")
+    labels = ["(dépôt principal)" if entry['path'] == '.' else entry['path'] for entry in submodules]
+    hours_data = [(label, round(entry['hours'], 1)) for label, entry in zip(labels, submodules)]
+    if any(h > 0 for _, h in hours_data):
+        generate_chart(hours_data, max(h for _, h in hours_data), "Heures estimées par dépôt")
+    for label, entry in zip(labels, submodules):
+        print_info(f"{label}: {entry['hours']:.2f}h, {entry['commits']} commits, {entry['sessions']} sessions, "
+                   f"{entry['authors']} auteurs", indent=2)
+    # Les sessions communes à plusieurs dépôts ne sont comptées qu'une fois dans le total
+    overlap = sum(entry['hours'] for entry in submodules) - total_hours
+    if overlap > 0.005:
+        print_info(f"Sessions partagées entre dépôts: {overlap:.2f}h comptées une seule fois dans le total", indent=2)
+
+def print_cache_rollups(rollups, recent_days=7):
+    """Affiche la session ouverte et les cumuls tenus à jour par les hooks."""
+    print_subheader("SESSION EN COURS ET CUMULS DU CACHE")
+    print_value("Sessions (cumul du cache)", rollups.sessions_count(), indent=2)
+    print_value("Temps total (cumul du cache)", f"{rollups.total_hours():.2f}", "heures", indent=2)
+
+    session = rollups.open_session
+    if session:
+        start = datetime.datetime.fromtimestamp(session['start'])
+        end = datetime.datetime.fromtimestamp(session['end'])
+        label = "Session en cours" if time.time() - session['end'] <= rollups.threshold * 3600 else "Dernière session"
+        print_value(label, f"{start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M}, {session['commits']} commits, "
+                           f"{rollups.session_hours(session):.2f}h", indent=2)
+
+    days = rollups.day_totals()
+    recent = sorted(days)[-recent_days:]
+    hours_data = [(day, round(days[day]['hours'], 1)) for day in recent]
+    if any(h > 0 for _, h in hours_data):
+        generate_chart(hours_data, max(h for _, h in hours_data), f"Heures estimées par jour ({len(recent)} derniers jours actifs)")
+    for day in recent:
+        print_info(f"{day}: {days[day]['commits']} commits, {days[day]['changes']} lignes, {days[day]['hours']:.2f}h", indent=2)
+
+def print_report(repo_path, repo_info, commits, sessions, time_estimate, author=None, since=None, until=None, branch=None, verbose=False, detailed=False,
+                 sample=None, time_budget=None, sample_seed=None, stats_stores=(), hotspots=None, hotspots_max_paths=100000,
+                 rolling=None, dedupe=None, categories=None, checkpoint=None, submodules=None, submodule_stores=None,
+                 cache_rollups=None):
+    """Affiche un rapport détaillé des statistiques."""
+    if not commits:
+        print_warning("Aucun commit trouvé correspondant aux critères.")
+        return
+    
+    if verbose:
+        print_step("Génération du rapport final", "📋")
+        
+    print_header(f"RAPPORT D'ANALYSE - {repo_info['name'].upper()}")
+    
+    print(f"\n{Colors.BOLD}Informations du projet{Colors.ENDC}")
+    print_value("Répertoire", repo_path, indent=2)
+    print_value("Dépôt", repo_info['name'], indent=2)
+    print_value("Branche", repo_info['branch'], indent=2)
+    
+    if author:
+        print_value("Auteur", author, indent=2)
+    if since or until:
+        date_range = []
+        if since:
+            date_range.append(f"depuis {since}")
+        if until:
+            date_range.append(f"jusqu'à {until}")
+        print_value("Période", ", ".join(date_range), indent=2)
+        
+    # Statistiques générales
+    first_commit = commits[0]['datetime']
+    last_commit = commits[-1]['datetime']
+    project_duration = last_commit - first_commit
+    project_days = max(1, project_duration.days)
+    
+    # Compter les auteurs
+    authors = {}
+    for commit in commits:
+        author_name = commit['author_name']
+        if author_name not in authors:
+            authors[author_name] = 0
+        authors[author_name] += 1
+    
+    print_subheader("STATISTIQUES GÉNÉRALES")
+    
+    print_value("Total des commits", len(commits), indent=2, highlight=True)
+    print_value("Premier commit", first_commit.strftime('%Y-%m-%d %H:%M:%S'), indent=2)
+    print_value("Dernier commit", last_commit.strftime('%Y-%m-%d %H:%M:%S'), indent=2)
+    
+    months = project_duration.days // 30
+    days = project_duration.days % 30
+    if months > 0:
+        duration_text = f"{months} mois, {days} jours"
+    else:
+        duration_text = f"{project_days} jours"
+    print_value("Durée du projet", duration_text, indent=2)
+    print_value("Moyenne de commits par jour", f"{len(commits) / project_days:.2f}", indent=2)
+    
+    # Principales statistiques horaires
+    print_value("Commits par semaine", f"{len(commits) / (project_days/7):.1f}", indent=2)
+    print_value("Commits par mois", f"{len(commits) / max(1, months):.1f}", indent=2)
+    
+    # Contributeurs
+    if len(authors) > 1:
+        print(f"\n{Colors.BOLD}Contributeurs{Colors.ENDC}")
+        sorted_authors = sorted(authors.items(), key=lambda x: x[1], reverse=True)
+        
+        # Génération du graphique des contributeurs
+        if len(sorted_authors) > 0:
+            max_commits = sorted_authors[0][1]
+            top_authors = sorted_authors[:min(8, len(sorted_authors))]
+            generate_chart(top_authors, max_commits, "Contributions par auteur")
+            if len(sorted_authors) > 8:
+                print_info(f"... et {len(sorted_authors)-8} autres contributeurs", indent=2)
+    
+    # Estimation du temps
+    print_subheader("ESTIMATION DU TEMPS DE TRAVAIL")
+    
+    print_value("Temps total estimé", f"{time_estimate['total_hours']:.2f}", "heures", indent=2, highlight=True)
+    print_value("Équivalent en jours de travail (8h)", f"{time_estimate['total_hours']/8:.2f}", "jours", indent=2)
+    print_value("Nombre de sessions de travail", time_estimate['sessions_count'], indent=2)
+    if dedupe is not None:
+        print_value("Copies de patchs écartées (cherry-pick/rebase)", dedupe['removed'], indent=2)
+        print_value("Temps retiré par la déduplication", f"{dedupe['hours_removed']:.2f}", "heures", indent=2)
+    
+    if time_estimate['sessions_count'] > 0:
+        avg_session_duration = time_estimate['total_hours'] / time_estimate['sessions_count']
+        print_value("Durée moyenne par session", f"{avg_session_duration:.2f}", "heures", indent=2)
+        print_value("Temps moyen par commit", f"{time_estimate['total_hours']/len(commits):.2f}", "heures", indent=2)
+        
+        # Facteur d'ajustement
+        adjustment_factor = time_estimate['total_hours'] / time_estimate['total_raw_hours'] if time_estimate['total_raw_hours'] > 0 else 1
+        print_value("Facteur d'ajustement appliqué", f"{adjustment_factor:.2f}x", indent=2)
+        
+        # Top 5 des sessions les plus longues
+        if detailed or verbose:
+            print(f"\n{Colors.BOLD}Top 5 des sessions les plus longues{Colors.ENDC}")
+            sorted_sessions = sorted(time_estimate['session_details'], 
+                                    key=lambda x: x['estimated_hours'], 
+                                    reverse=True)
+            for i, session in enumerate(sorted_sessions[:5]):
+                start_date = session['start'].strftime('%Y-%m-%d')
+                start_time = session['start'].strftime('%H:%M')
+                hours = session['estimated_hours']
+                commits_count = session['commits']
+                
+                commit_msg = session['start'].strftime('%Y-%m-%d %H:%M')
+                print_info(f"{i+1}. {start_date} à {start_time} - {hours:.2f}h ({commits_count} commits) - \"{commit_msg}\"", indent=2)
+    
+    # Répartition par type de travail (messages de commit)
+    if categories:
+        print_category_breakdown(*categories)
+    
+    # Sous-totaux par sous-module (--recurse-submodules)
+    if submodules:
+        print_submodule_breakdown(submodules, time_estimate['total_hours'])
+
+    if cache_rollups:
+        print_cache_rollups(cache_rollups)
+    
+    # Distribution des sessions par jour de la semaine
+    if time_estimate['sessions_count'] > 0:
+        days = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+        day_dist = defaultdict(int)
+        hour_dist = defaultdict(int)
+        day_hours = defaultdict(float)
+        
+        for session in time_estimate['session_details']:
+            day = session['start'].weekday()
+            hour = session['start'].hour
+            day_dist[day] += 1
+            hour_dist[hour] += 1
+            day_hours[day] += session['estimated_hours']
+            
+        # Génération du graphique des jours (nombre de sessions)
+        day_data = [(days[day_idx], count) for day_idx, count in sorted(day_dist.items())]
+        if day_data:
+            max_count = max(count for _, count in day_data)
+            generate_chart(day_data, max_count, "Sessions par jour de la semaine")
+        
+        # Génération du graphique des jours (heures de travail)
+        if detailed or verbose:
+            day_hours_data = [(days[day_idx], hours) for day_idx, hours in sorted(day_hours.items())]
+            if day_hours_data:
+                max_hours = max(hours for _, hours in day_hours_data)
+                generate_chart(day_hours_data, max_hours, "Heures de travail par jour de la semaine")
+        
+        # Distribution par heure de la journée
+        if detailed or verbose:
             print(f"\n{Colors.BOLD}Distribution par heure de la journée{Colors.ENDC}")
             hour_data = [(f"{hour}h", count) for hour, count in sorted(hour_dist.items())]
             if hour_data:
@@ -754,65 +3074,16 @@ def print_report(repo_path, repo_info, commits, sessions, time_estimate, author=
                 generate_calendar_heatmap(commits, year=most_active_year)
             # Activité par taille de commits
     if detailed or verbose:
-        print_subheader("ANALYSE DE L'ACTIVITÉ")
-        
-        # Récupérer les statistiques de chaque commit
-        commit_stats = []
-        for commit in commits:
-            try:
-                # Récupérer les stats de ce commit (fichiers modifiés, insertions, suppressions)
-                stat_cmd = ['show', '--stat', '--format=format:', commit['hash']]
-                stat_output = run_git_command(repo_path, stat_cmd, False)
-                
-                if stat_output:
-                    # Analyser les statistiques
-                    changes = 0
-                    files_changed = 0
-                    
-                    # Chercher le résumé à la fin
-                    summary_match = re.search(r'(\d+) files? changed(?:, (\d+) insertions?\(\+\))?(?:, (\d+) deletions?\(-\))?', stat_output)
-                    if summary_match:
-                        files_changed = int(summary_match.group(1) or 0)
-                        insertions = int(summary_match.group(2) or 0)
-                        deletions = int(summary_match.group(3) or 0)
-                        changes = insertions + deletions
-                    
-                    commit_stats.append({
-                        'hash': commit['hash'],
-                        'datetime': commit['datetime'],
-                        'files_changed': files_changed,
-                        'changes': changes
-                    })
-            except Exception as e:
-                # Ignorer les erreurs et continuer
-                pass
-        
-        if commit_stats:
-            # Calculer des statistiques sur les changements
-            total_changes = sum(c['changes'] for c in commit_stats)
-            total_files = sum(c['files_changed'] for c in commit_stats)
-            avg_changes = total_changes / len(commit_stats) if commit_stats else 0
-            
-            print_value("Total de lignes modifiées", total_changes, indent=2)
-            print_value("Moyenne de lignes par commit", f"{avg_changes:.1f}", indent=2)
-            print_value("Total de fichiers touchés", total_files, indent=2)
-            print_value("Moyenne de fichiers par commit", f"{total_files/len(commit_stats):.1f}" if commit_stats else "0", indent=2)
-            
-            # Classifier les commits par taille
-            small_commits = sum(1 for c in commit_stats if c['changes'] < 10)
-            medium_commits = sum(1 for c in commit_stats if 10 <= c['changes'] < 100)
-            large_commits = sum(1 for c in commit_stats if 100 <= c['changes'] < 500)
-            huge_commits = sum(1 for c in commit_stats if c['changes'] >= 500)
-            
-            size_data = [
-                ("Petits (<10)", small_commits),
-                ("Moyens (<100)", medium_commits),
-                ("Grands (<500)", large_commits),
-                ("Énormes (500+)", huge_commits)
-            ]
-            
-            if any(count > 0 for _, count in size_data):
-                generate_chart(size_data, max(count for _, count in size_data), "Commits par taille (lignes modifiées)")
+        print_activity_analysis(repo_path, commits, verbose, sample, time_budget, sample_seed, stats_stores, checkpoint,
+                                submodule_stores)
+    
+    # Séries glissantes
+    if rolling:
+        print_rolling_series(rolling)
+    
+    # Fichiers les plus actifs
+    if hotspots:
+        print_hotspots(repo_path, time_estimate, sessions, hotspots, hotspots_max_paths, author, since, until, branch, verbose)
     
     # Recommandations
     if time_estimate['sessions_count'] > 5:
@@ -875,8 +3146,484 @@ def export_to_csv(filename, commits, sessions, time_estimate):
             ])
     
     print_info(f"Données exportées vers {filename} et {commits_filename}")
+
+def estimate_by_author(commits, session_threshold=3):
+    """Sessionise et estime séparément les commits de chaque auteur."""
+    by_author = defaultdict(list)
+    for commit in commits:
+        by_author[commit['author_name']].append(commit)
+
+    return {
+        author_name: (author_commits, sessions, estimate_work_time(sessions))
+        for author_name, author_commits in by_author.items()
+        for sessions in [calculate_work_sessions(author_commits, session_threshold)]
+    }
+
+def estimate_hours_by_author(commits, session_threshold=3):
+    """Estime les heures et sessions de chaque auteur, sessionisé séparément."""
+    result = {}
+    for author_name, (author_commits, _, estimate) in estimate_by_author(commits, session_threshold).items():
+        result[author_name] = {
+            'commits': len(author_commits),
+            'sessions': estimate['sessions_count'],
+            'hours': estimate['total_hours']
+        }
+    return result
+
+class NdjsonWriter:
+    """Écrit des documents NDJSON dans des fichiers tournants de taille bornée."""
+
+    def __init__(self, directory, fmt='bulk', max_bytes=10 * 1024 * 1024):
+        self.directory = directory
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.extension = '.ndjson' if fmt == 'bulk' else '.log'
+        self.file = None
+        self.size = 0
+        self.files = []
+        self.written = 0
+        self.deleted = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Reprendre la numérotation après les fichiers existants
+        numbers = [int(m.group(1)) for m in (re.fullmatch(r'git-time-(\d+)\.(?:ndjson|log)', f) for f in os.listdir(directory)) if m]
+        self.number = max(numbers, default=0)
+
+    def write(self, index, doc_id, doc):
+        """Ajoute un document (et sa ligne d'action en format bulk)."""
+        if self.fmt == 'bulk':
+            action = {'index': {'_index': index, '_id': doc_id}}
+            payload = json.dumps(action, ensure_ascii=False) + '\n' + json.dumps(doc, ensure_ascii=False) + '\n'
+        else:
+            payload = json.dumps(dict(doc, id=doc_id, index=index), ensure_ascii=False) + '\n'
+        self.append(payload.encode('utf-8'))
+        self.written += 1
+
+    def delete(self, index, doc_id, doc_type):
+        """Supprime un document déjà expédié (action delete en format bulk, tombstone sinon)."""
+        if self.fmt == 'bulk':
+            payload = json.dumps({'delete': {'_index': index, '_id': doc_id}}, ensure_ascii=False) + '\n'
+        else:
+            payload = json.dumps({'@timestamp': datetime.datetime.now().astimezone().isoformat(), 'type': doc_type,
+                                  'deleted': True, 'id': doc_id, 'index': index}, ensure_ascii=False) + '\n'
+        self.append(payload.encode('utf-8'))
+        self.deleted += 1
+
+    def append(self, data):
+        if self.file is None or (self.size > 0 and self.size + len(data) > self.max_bytes):
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    def rotate(self):
+        """Ferme le fichier courant et en ouvre un nouveau."""
+        if self.file:
+            self.file.close()
+        self.number += 1
+        path = os.path.join(self.directory, f"git-time-{self.number:06d}{self.extension}")
+        self.file = open(path, 'wb')
+        self.size = 0
+        self.files.append(path)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def export_to_ndjson(directory, repo_path, repo_info, commits, session_threshold=3, branch=None, fmt='bulk',
+                     max_bytes=10 * 1024 * 1024, index_prefix='git-time', verbose=False):
+    """Exporte commits et sessions en NDJSON pour Elasticsearch (_bulk) ou Filebeat.
+
+    Les hashes déjà expédiés sont listés par dépôt et branche dans le répertoire:
+    quels que soient les filtres (--author, --since, --where...), seuls les commits
+    jamais expédiés sont écrits. Les sessions expédiées y sont aussi enregistrées avec
+    leurs commits: une session qui en absorbe une autre (nouveaux commits qui la
+    prolongent ou la fusionnent) supprime l'ancien document.
+    """
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', f"{os.path.abspath(repo_path)}@{branch or 'HEAD'}")
+    shipped_path = os.path.join(directory, f".git-time-shipped-{name}.txt")
+    shipped = set()
+    if os.path.exists(shipped_path):
+        with open(shipped_path, encoding='utf-8') as f:
+            shipped = set(f.read().split())
+    sessions_path = os.path.join(directory, f".git-time-sessions-{name}.json")
+    shipped_sessions = {}
+    if os.path.exists(sessions_path):
+        with open(sessions_path, encoding='utf-8') as f:
+            shipped_sessions = json.load(f)
+    session_of = {h: session_id for session_id, hashes in shipped_sessions.items() for h in hashes}
+
+    # N'expédier que les commits absents des envois précédents
+    new_commits = [c for c in commits if c['hash'] not in shipped]
+
+    if verbose:
+        print_step("Export NDJSON", "📦")
+        print_info(f"{len(new_commits)}/{len(commits)} commits à expédier", indent=2)
+
+    writer = NdjsonWriter(directory, fmt, max_bytes)
+    try:
+        for commit in new_commits:
+            writer.write(f"{index_prefix}-commits", commit['hash'], {
+                '@timestamp': commit['datetime'].astimezone().isoformat(),
+                'type': 'commit',
+                'repository': repo_info['name'],
+                'branch': branch or repo_info['branch'],
+                'hash': commit['hash'],
+                'author_name': commit['author_name'],
+                'author_email': commit['author_email'],
+                'message': commit['message']
+            })
+
+        # Les sessions touchées par un nouveau commit sont réécrites (même id)
+        new_hashes = {c['hash'] for c in new_commits}
+        for author_name, (_, sessions, estimate) in estimate_by_author(commits, session_threshold).items():
+            for session, details in zip(sessions, estimate['session_details']):
+                if not any(c['hash'] in new_hashes for c in session):
+                    continue
+                author_email = session[0]['author_email']
+                session_id = f"{session[0]['timestamp']}-{author_email}"
+                members = [c['hash'] for c in session]
+
+                # Sessions expédiées sous un autre id et entièrement contenues dans celle-ci
+                for old_id in {session_of[h] for h in members if h in session_of} - {session_id}:
+                    if set(shipped_sessions[old_id]) <= set(members):
+                        writer.delete(f"{index_prefix}-sessions", old_id, 'session')
+                        del shipped_sessions[old_id]
+                shipped_sessions[session_id] = members
+                session_of.update((h, session_id) for h in members)
+
+                writer.write(f"{index_prefix}-sessions", session_id, {
+                    '@timestamp': details['start'].astimezone().isoformat(),
+                    'type': 'session',
+                    'repository': repo_info['name'],
+                    'branch': branch or repo_info['branch'],
+                    'author_name': author_name,
+                    'author_email': author_email,
+                    'start': details['start'].astimezone().isoformat(),
+                    'end': details['end'].astimezone().isoformat(),
+                    'commits': details['commits'],
+                    'raw_hours': round(details['raw_hours'], 4),
+                    'estimated_hours': round(details['estimated_hours'], 4)
+                })
+    finally:
+        writer.close()
+
+    with open(shipped_path, 'a', encoding='utf-8') as f:
+        f.writelines(f"{c['hash']}\n" for c in new_commits)
+    tmp_path = sessions_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(shipped_sessions, f)
+    os.replace(tmp_path, sessions_path)
+
+    print_info(f"{writer.written} documents NDJSON écrits dans {len(writer.files)} fichier(s) sous {directory}")
+    if writer.deleted:
+        print_info(f"{writer.deleted} sessions remplacées supprimées de l'index", indent=2)
+
+def escape_prometheus_label(value):
+    """Échappe une valeur de label au format texte Prometheus."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsIndex:
+    """Index en mémoire des commits, rafraîchi de façon incrémentale pour l'export Prometheus."""
+
+    def __init__(self, repo_path, author=None, since=None, until=None, branch=None, session_threshold=3):
+        self.repo_path = repo_path
+        self.author = author
+        self.since = since
+        self.until = until
+        self.branch = branch
+        self.session_threshold = session_threshold
+        self.tip = None
+        self.commits = []
+        self.by_author = {}
+        self.totals = {'total_hours': 0, 'sessions_count': 0}
+        self.line_stats = {}
+        self.insertions = 0
+        self.deletions = 0
+        self.phase_durations = {}
+        self.refreshes = 0
+        self.last_refresh = 0
+        self.rendered = b''
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Intègre les nouveaux commits depuis le dernier rafraîchissement."""
+        phases = {}
+        start = time.time()
+        tip = run_git_command(self.repo_path, ['rev-parse', self.branch or 'HEAD'], False)
+        # Avec --since/--until (souvent relatifs: "2 weeks ago"), la fenêtre glisse
+        # même sans nouveau commit: elle est relue à chaque rafraîchissement
+        windowed = bool(self.since or self.until)
+        if tip and (tip != self.tip or windowed):
+            commits = self.commits
+            if windowed:
+                listed = run_git_command(self.repo_path, ['rev-list'] + build_log_filters(self.author, self.since, self.until)
+                                         + [tip], False)
+                window = set(listed.split()) if listed else set()
+                known = {c['hash'] for c in commits}
+                commits = [c for c in commits if c['hash'] in window]
+                new_commits = get_commits_by_hash(self.repo_path, [h for h in window if h not in known])
+            else:
+                new_range = self.branch
+                # Historique réécrit: reconstruire l'index complet
+                if self.tip and is_ancestor_commit(self.repo_path, self.tip, tip):
+                    new_range = f"{self.tip}..{tip}"
+                else:
+                    commits = []
+                new_commits = get_commits(self.repo_path, self.author, self.since, self.until, new_range, False)
+            phases['commits'] = time.time() - start
+
+            phase_start = time.time()
+            for commit_stats in collect_commit_stats(self.repo_path, new_commits):
+                self.line_stats[commit_stats['hash']] = (commit_stats['insertions'], commit_stats['deletions'])
+            kept = {c['hash'] for c in commits} | {c['hash'] for c in new_commits}
+            self.line_stats = {h: v for h, v in self.line_stats.items() if h in kept}
+            self.insertions = sum(ins for ins, _ in self.line_stats.values())
+            self.deletions = sum(dels for _, dels in self.line_stats.values())
+            phases['stats'] = time.time() - phase_start
+
+            phase_start = time.time()
+            commits = sorted(commits + new_commits, key=lambda x: x['timestamp'])
+            by_author = estimate_hours_by_author(commits, self.session_threshold)
+            sessions = calculate_work_sessions(commits, self.session_threshold)
+            totals = estimate_work_time(sessions)
+            phases['sessions'] = time.time() - phase_start
+
+            self.commits = commits
+            self.by_author = by_author
+            self.totals = totals
+            self.tip = tip
+        else:
+            phases['commits'] = time.time() - start
+
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.phase_durations.update(phases)
+        phase_start = time.time()
+        rendered = self.render()
+        self.phase_durations['render'] = time.time() - phase_start
+        with self.lock:
+            self.rendered = rendered
+
+    def render(self):
+        """Produit la page /metrics au format texte Prometheus."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{escape_prometheus_label(str(v))}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        totals = self.totals
+        authors = sorted(self.by_author.items())
+
+        # Jauges et non compteurs: ces valeurs baissent si l'historique est réécrit
+        # ou si des commits sortent de la fenêtre --since/--until
+        metric('git_time_commits', 'gauge', 'Nombre de commits analysés.',
+               [({}, len(self.commits))])
+        metric('git_time_author_commits', 'gauge', 'Nombre de commits par auteur.',
+               [({'author': a}, d['commits']) for a, d in authors])
+        metric('git_time_sessions', 'gauge', 'Nombre de sessions de travail.',
+               [({}, totals['sessions_count'])])
+        metric('git_time_author_sessions', 'gauge', 'Nombre de sessions de travail par auteur.',
+               [({'author': a}, d['sessions']) for a, d in authors])
+        metric('git_time_estimated_hours', 'gauge', 'Temps de travail total estimé en heures.',
+               [({}, f"{totals['total_hours']:.4f}")])
+        metric('git_time_author_estimated_hours', 'gauge', 'Temps de travail estimé par auteur en heures.',
+               [({'author': a}, f"{d['hours']:.4f}") for a, d in authors])
+        metric('git_time_lines_changed', 'gauge', 'Lignes modifiées (numstat).',
+               [({'kind': 'insertions'}, self.insertions), ({'kind': 'deletions'}, self.deletions)])
+        metric('git_time_phase_duration_seconds', 'gauge', 'Durée de chaque phase du dernier rafraîchissement.',
+               [({'phase': p}, f"{d:.6f}") for p, d in sorted(self.phase_durations.items())])
+        metric('git_time_index_refreshes_total', 'counter', 'Nombre de rafraîchissements de l\'index.',
+               [({}, self.refreshes)])
+        metric('git_time_last_refresh_timestamp_seconds', 'gauge', 'Horodatage du dernier rafraîchissement.',
+               [({}, f"{self.last_refresh:.3f}")])
+
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def scrape(self):
+        """Retourne la dernière page rendue, sans jamais parcourir l'historique."""
+        with self.lock:
+            return self.rendered
+
+def serve_prometheus_metrics(repo_path, port, host='0.0.0.0', interval=60, author=None, since=None, until=None, branch=None,
+                             session_threshold=3, verbose=False):
+    """Sert /metrics pour Prometheus et rafraîchit l'index en arrière-plan."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    index = MetricsIndex(repo_path, author, since, until, branch, session_threshold)
+    print_step("Construction de l'index des métriques", "📈")
+    index.refresh()
+    print_success(f"{len(index.commits)} commits indexés", indent=2)
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = index.scrape()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                print_info(f"{self.address_string()} - {format % args}", indent=2)
+
+    def refresh_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                index.refresh()
+            except Exception as e:
+                print_error(f"Erreur lors du rafraîchissement de l'index: {str(e)}", indent=2)
+
+    threading.Thread(target=refresh_loop, daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    print_success(f"Métriques disponibles sur http://{host}:{server.server_port}/metrics (rafraîchissement toutes les {interval:g}s)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+def merge_submodules(repo_path, commits, args, detailed=False, global_cache=None, classifier=None, verbose=False):
+    """Ajoute aux commits du dépôt principal ceux de ses sous-modules.
+
+    En mode détaillé, prépare pour chaque sous-module ses propres caches (cache local,
+    cache utilisateur, notes): le numstat de ses commits y sera résolu à la demande,
+    pendant l'analyse d'activité (voir fetch_commits_numstat).
+    Retourne (commits triés par date, {nom: (chemin, caches)} ou None).
+    """
+    submodules = discover_submodules(repo_path)
+    if verbose:
+        print_step(f"Lecture de {len(submodules)} sous-modules en parallèle", "🧩")
+
+    # Flux numstat seulement si l'analyse complète aura lieu (mêmes conditions que pour
+    # le dépôt principal) et pour les sous-modules qu'aucun cache ne couvre déjà
+    streamed = set()
+    if detailed and not (args.cache or args.notes or args.sample or args.time_budget or args.checkpoint):
+        for name, path in submodules:
+            tip = run_git_command(path, ['rev-parse', 'HEAD'], False)
+            if not (global_cache and tip and global_cache.contains(tip)):
+                streamed.add(name)
+
+    collected = asyncio.run(collect_submodules(submodules, args.author, args.since, args.until, args.threshold,
+                                               streamed, verbose, classifier))
+    merged = list(commits)
+    for commit in merged:
+        commit['repo'] = '.'
+    submodule_stores = {} if detailed else None
+    for name, path in submodules:
+        sub_commits, sub_numstat = collected[name]
+        merged.extend(sub_commits)
+        if not detailed or not sub_commits:
+            continue
+
+        stores = []
+        if args.cache:
+            cache = CommitCache(path)
+            cache.update(verbose)
+            stores.append(cache)
+        if global_cache:
+            stores.append(global_cache)
+        if sub_numstat is not None:
+            stores.append(PrefetchedStatsStore(sub_numstat))
+        if args.notes:
+            stores.append(NotesStatsStore(path, args.notes_ref))
+        submodule_stores[name] = (path, stores)
+
+    unify_author_identities(merged)
+    merged.sort(key=lambda x: x['timestamp'])
+    return merged, submodule_stores
+
+# Hooks installés par `git-time install-hooks`
+HOOK_NAMES = ('post-commit', 'post-merge', 'post-rewrite')
+HOOK_MARKER = '# git-time: mise à jour incrémentale du cache'
+
+def install_hooks(repo_path, force=False):
+    """Installe les hooks qui tiennent le cache des commits à jour (en arrière-plan)."""
+    hooks_dir = run_git_command(repo_path, ['rev-parse', '--git-path', 'hooks'], False)
+    if not hooks_dir:
+        return False
+    if not os.path.isabs(hooks_dir):
+        hooks_dir = os.path.join(repo_path, hooks_dir)
+    os.makedirs(hooks_dir, exist_ok=True)
+
+    script = os.path.abspath(__file__)
+    for name in HOOK_NAMES:
+        path = os.path.join(hooks_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                ours = HOOK_MARKER in f.read()
+            if not ours and not force:
+                print_warning(f"Hook {name} existant conservé (--force pour le remplacer, une copie .orig est gardée)", indent=2)
+                continue
+            if not ours:
+                os.replace(path, path + '.orig')
+
+        command = f"\"{sys.executable}\" \"{script}\" hook {name} \"$@\" >/dev/null 2>&1 &"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("#!/bin/sh\n")
+            f.write(f"{HOOK_MARKER} (git-time install-hooks)\n")
+            if name == 'post-rewrite':
+                # Les paires « ancien nouveau » arrivent sur l'entrée standard, qu'une
+                # commande en arrière-plan ne voit pas: les lire avant de la lancer
+                f.write('pairs=$(cat)\n')
+                f.write(f'printf "%s\\n" "$pairs" | {command}\n')
+            else:
+                f.write(f"{command}\n")
+        os.chmod(path, 0o755)
+        print_success(f"Hook {name} installé", indent=2)
+    return True
+
+def run_hook(repo_path, name):
+    """Point d'entrée des hooks: temps constant par nouveau commit, réécritures traitées plus tard."""
+    cache = CommitCache(repo_path)
+    if name == 'post-rewrite':
+        rewritten = [line.split()[0] for line in sys.stdin if line.strip()]
+        cache.mark_rewritten(rewritten)
+    else:
+        cache.advance()
+
+def run_subcommand(command, argv):
+    """Sous-commandes `install-hooks` et `hook` (appelée par les hooks installés)."""
+    if not sys.stdout.isatty():
+        Colors.disable()
+    parser = argparse.ArgumentParser(prog=f"git-time {command}")
+    parser.add_argument('--repo', '-r', default='.', help='Chemin vers le dépôt Git (par défaut: répertoire courant)')
+    if command == 'install-hooks':
+        parser.description = "Installe les hooks post-commit, post-merge et post-rewrite qui tiennent le cache à jour"
+        parser.add_argument('--force', action='store_true', help='Remplace les hooks existants (copie .orig conservée)')
+    else:
+        parser.add_argument('name', choices=HOOK_NAMES)
+        parser.add_argument('hook_args', nargs='*')
+    args = parser.parse_args(argv)
+    repo_path = os.path.abspath(args.repo)
+
+    if command == 'install-hooks':
+        if not is_git_repo(repo_path):
+            print_error(f"Le répertoire {repo_path} n'est pas un dépôt Git valide.")
+            sys.exit(1)
+        print_step("Installation des hooks git-time", "🪝")
+        if not install_hooks(repo_path, args.force):
+            sys.exit(1)
+        print_info("Le cache est créé au prochain rapport avec --cache, puis complété à chaque commit.", indent=2)
+    else:
+        run_hook(repo_path, args.name)
+
 def main():
-    parser = argparse.ArgumentParser(description="Analyse le temps de travail sur un projet Git")
+    if len(sys.argv) > 1 and sys.argv[1] in ('install-hooks', 'hook'):
+        return run_subcommand(sys.argv[1], sys.argv[2:])
+    
+    parser = argparse.ArgumentParser(description="Analyse le temps de travail sur un projet Git",
+                                     epilog="Sous-commande: git-time install-hooks [--repo CHEMIN] [--force] installe des hooks "
+                                            "qui complètent le cache (--cache) à chaque commit.")
     parser.add_argument('--repo', '-r', default='.', help='Chemin vers le dépôt Git (par défaut: répertoire courant)')
     parser.add_argument('--author', '-a', help='Filtrer par auteur (ex: "John Doe" ou motif glob)')
     parser.add_argument('--since', '-s', help='Filtrer les commits depuis cette date (ex: "2023-01-01" ou "2 weeks ago")')
@@ -894,6 +3641,69 @@ def main():
                       help='Mode rapide: limite l\'analyse aux 1000 derniers commits')
     parser.add_argument('--export', '-e', 
                       help='Exporter les résultats vers un fichier CSV (spécifier le nom du fichier)')
+    parser.add_argument('--sample',
+                      help='Avec --detailed: statistiques estimées sur un échantillon stratifié (taux "0.1", "10%%" ou nombre de commits "500")')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDES',
+                      help='Avec --sample: continue l\'échantillonnage jusqu\'à épuisement du budget de temps')
+    parser.add_argument('--sample-seed', type=int,
+                      help='Graine aléatoire pour un échantillonnage reproductible')
+    parser.add_argument('--sweep', action='append', metavar='NOM=DÉBUT:FIN:PAS',
+                      help='Calcule l\'estimation pour une plage de paramètres (threshold, cap, floor, factor, max-factor); répétable')
+    parser.add_argument('--sweep-export', metavar='FICHIER',
+                      help='Avec --sweep: exporte le tableau des résultats en CSV')
+    parser.add_argument('--cache', action='store_true',
+                      help='Utilise le cache local des commits et numstat (.git/git-time/), mis à jour de façon incrémentale')
+    parser.add_argument('--where', metavar='EXPRESSION',
+                      help='Filtre les commits en cache sans appeler git, ex: "message~websocket and author~alice and date=2024-Q2" '
+                           '(champs: author, message, path, date; opérateurs: = ~ >= <= > <; and/or/not, parenthèses)')
+    parser.add_argument('--recurse-submodules', action='store_true',
+                      help='Inclut les sous-modules (récursivement) dans le rapport, avec des sous-totaux par sous-module')
+    parser.add_argument('--dedupe-patches', action='store_true',
+                      help='Ne compte qu\'une fois les commits au patch identique (cherry-pick, rebase), via git patch-id')
+    parser.add_argument('--classify', action='store_true',
+                      help='Répartit le temps par type de travail (feat/fix/refactor/docs..., revert, merge) et par ticket (ex: TRANS-123)')
+    parser.add_argument('--classify-rules', metavar='FICHIER',
+                      help='Règles supplémentaires "catégorie = regex", prioritaires sur les règles par défaut (implique --classify)')
+    parser.add_argument('--rolling', metavar='FENÊTRES',
+                      help='Séries glissantes journalières d\'heures et de commits par auteur (ex: "7d,28d")')
+    parser.add_argument('--rolling-export', metavar='FICHIER',
+                      help='Avec --rolling: exporte les séries en CSV ou JSON (selon l\'extension)')
+    parser.add_argument('--hotspots', type=int, metavar='N',
+                      help='Affiche les N fichiers avec le plus de lignes modifiées, de commits et de temps de session')
+    parser.add_argument('--hotspots-max-paths', type=int, default=100000,
+                      help='Au-delà de ce nombre de chemins, --hotspots passe en mode approché à mémoire fixe (par défaut: 100000)')
+    parser.add_argument('--no-global-cache', action='store_true',
+                      help='Désactive le cache utilisateur des statistiques par commit (~/.cache/git-time/objects/)')
+    parser.add_argument('--global-cache-dir', metavar='RÉPERTOIRE',
+                      help='Répertoire du cache utilisateur (par défaut: $XDG_CACHE_HOME/git-time/objects)')
+    parser.add_argument('--global-cache-max-mb', type=int, default=512,
+                      help='Taille maximale du cache utilisateur en Mio avant éviction LRU (par défaut: 512)')
+    parser.add_argument('--cache-stats', action='store_true',
+                      help='Affiche les succès et échecs du cache utilisateur après le rapport')
+    parser.add_argument('--checkpoint', action='store_true',
+                      help='Enregistre régulièrement la progression de l\'analyse détaillée pour pouvoir la reprendre (gros historiques)')
+    parser.add_argument('--resume', action='store_true',
+                      help='Reprend une analyse interrompue depuis son dernier point de reprise (.git/git-time/checkpoint.json); implique --checkpoint')
+    parser.add_argument('--checkpoint-interval', type=float, default=30, metavar='SECONDES',
+                      help='Avec --checkpoint: intervalle d\'enregistrement du point de reprise (par défaut: 30)')
+    parser.add_argument('--notes', action='store_true',
+                      help='Lit et enregistre les statistiques par commit dans des notes git, partageables entre clones')
+    parser.add_argument('--notes-ref', default='refs/notes/git-time',
+                      help='Ref des notes utilisé par --notes (par défaut: refs/notes/git-time)')
+    parser.add_argument('--ndjson-dir',
+                      help='Exporte commits et sessions en NDJSON dans ce répertoire (fichiers tournants)')
+    parser.add_argument('--ndjson-format', choices=['bulk', 'filebeat'], default='bulk',
+                      help='Format NDJSON: "bulk" (API _bulk d\'Elasticsearch) ou "filebeat" (un document par ligne)')
+    parser.add_argument('--ndjson-index', default='git-time',
+                      help='Préfixe des index Elasticsearch (par défaut: git-time)')
+    parser.add_argument('--ndjson-max-bytes', type=int, default=10 * 1024 * 1024,
+                      help='Taille maximale de chaque fichier NDJSON en octets (par défaut: 10 Mio)')
+    parser.add_argument('--prometheus-port', type=int,
+                      help='Sert les métriques Prometheus sur ce port (/metrics) au lieu d\'afficher le rapport')
+    parser.add_argument('--prometheus-host', default='0.0.0.0',
+                      help='Adresse d\'écoute de l\'exporteur Prometheus (par défaut: 0.0.0.0)')
+    parser.add_argument('--prometheus-interval', type=float, default=60.0, metavar='SECONDES',
+                      help='Intervalle de rafraîchissement de l\'index des métriques (par défaut: 60)')
     parser.add_argument('--version', action='version', version=f'GitInfos v{VERSION}')
     
     # Commandes rapides
@@ -905,6 +3715,48 @@ def main():
     
     args = parser.parse_args()
     
+    if args.sample:
+        try:
+            parse_sample_spec(args.sample)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.time_budget is not None and args.time_budget <= 0:
+        parser.error("--time-budget doit être positif")
+    classifier = None
+    if args.classify or args.classify_rules:
+        try:
+            classifier = CommitClassifier(load_classify_rules(args.classify_rules) if args.classify_rules else None)
+        except (OSError, ValueError, re.error) as e:
+            parser.error(str(e))
+    
+    if args.where:
+        try:
+            parse_where(args.where)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.recurse_submodules:
+        unsupported = [flag for flag, value in (('--where', args.where), ('--dedupe-patches', args.dedupe_patches),
+                                                ('--hotspots', args.hotspots), ('--prometheus-port', args.prometheus_port))
+                       if value]
+        if unsupported:
+            parser.error(f"--recurse-submodules n'est pas compatible avec {', '.join(unsupported)}")
+    
+    if args.rolling:
+        try:
+            rolling_windows = parse_rolling_windows(args.rolling)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    sweeps = {}
+    for spec in args.sweep or []:
+        try:
+            name, values = parse_sweep_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+        sweeps[name] = values
+    sweeps.setdefault('threshold', [args.threshold])
+    
     # Traiter les commandes rapides
     if args.last_week:
         args.since = "1 week ago"
@@ -923,6 +3775,11 @@ def main():
         except:
             print_warning("Impossible de déterminer votre nom d'utilisateur Git. Utilisez --author manuellement.")
     
+    # Après les commandes rapides, qui renseignent aussi l'auteur et la date de début
+    if args.where and (args.author or args.since or args.until):
+        parser.error("--where remplace --author/--since/--until/--me/--last-week/--last-month/--last-year "
+                     "(utilisez author~... et date>=... dans l'expression)")
+    
     # Mode rapide
     if args.quick:
         args.max_commits = 1000
@@ -935,7 +3792,9 @@ def main():
     
     repo_path = os.path.abspath(args.repo)
     verbose = args.verbose
-    detailed = args.detailed
+    # L'échantillonnage ne concerne que les statistiques détaillées
+    args.checkpoint = args.checkpoint or args.resume
+    detailed = args.detailed or bool(args.sample or args.time_budget or args.checkpoint)
     
     # Démarrer le chronomètre pour mesurer le temps d'exécution
     start_time = time.time()
@@ -951,17 +3810,65 @@ def main():
         print_error(f"Le répertoire {repo_path} n'est pas un dépôt Git valide.")
         sys.exit(1)
     
-    # Récupérer des informations de base sur le dépôt
-    repo_info = get_repo_info(repo_path, verbose)
+    # Mode exporteur Prometheus: pas de rapport, l'index est servi en continu
+    if args.prometheus_port is not None:
+        serve_prometheus_metrics(repo_path, args.prometheus_port, args.prometheus_host, args.prometheus_interval,
+                                 args.author, args.since, args.until, args.branch, args.threshold, verbose)
+        return
     
-    # Récupérer les commits
+    # Cache utilisateur partagé entre clones: si le commit de tête y est déjà,
+    # inutile de lancer le flux numstat complet au démarrage
+    tip = run_git_command(repo_path, ['rev-parse', args.branch or 'HEAD'], False) if detailed else None
+    global_cache = None
+    global_cache_warm = False
+    if detailed and not args.no_global_cache:
+        global_cache = GlobalStatsCache(args.global_cache_dir, args.global_cache_max_mb * 1024 * 1024)
+        global_cache_warm = bool(tip) and global_cache.contains(tip)
+    
+    # Récupérer les commits (depuis le cache local si demandé)
+    commit_cache = None
+    submodule_stores = None
+    sessions = None
+    prefetched_numstat = None
     try:
-        commits = get_commits(repo_path, args.author, args.since, args.until, args.branch, verbose)
+        if not (args.where or args.cache):
+            # Infos du dépôt, flux des commits et flux numstat en parallèle
+            collect_numstat = detailed and not (args.sample or args.time_budget or args.notes or global_cache_warm
+                                             or args.checkpoint)
+            repo_info, commits, sessions, prefetched_numstat = asyncio.run(run_startup_pipeline(
+                repo_path, args.author, args.since, args.until, args.branch, args.threshold, collect_numstat, verbose,
+                classifier))
+        else:
+            repo_info = get_repo_info(repo_path, verbose)
+        
+        if args.where or args.cache:
+            if verbose:
+                print_step("Mise à jour du cache des commits", "🗃️")
+            commit_cache = CommitCache(repo_path, args.branch)
+            commit_cache.update(verbose)
+        
+        if args.where:
+            if verbose:
+                print_step(f"Interrogation de l'index: {args.where}", "🔎")
+            commits = CommitQueryIndex(commit_cache.commits).query(args.where)
+            if verbose:
+                print_success(f"{len(commits)} commits sélectionnés sur {len(commit_cache.commits)}", indent=2)
+        elif commit_cache and not (args.author or args.since or args.until):
+            commits = commit_cache.commits
+        elif commit_cache:
+            commits = get_commits(repo_path, args.author, args.since, args.until, args.branch, verbose)
+        
+        # Sous-modules: mêmes filtres, lus en parallèle puis fusionnés sur une même chronologie
+        if args.recurse_submodules:
+            commits, submodule_stores = merge_submodules(repo_path, commits, args, detailed, global_cache,
+                                                          classifier, verbose)
+            sessions = None
         
         if args.max_commits and len(commits) > args.max_commits:
             if verbose:
                 print_warning(f"Limitation à {args.max_commits} commits (mode rapide activé)", indent=2)
             commits = commits[-args.max_commits:]  # Garder les plus récents
+            sessions = None
     except Exception as e:
         print_error(f"Erreur lors de la récupération des commits: {str(e)}")
         sys.exit(1)
@@ -970,22 +3877,119 @@ def main():
         print_warning("Aucun commit trouvé correspondant aux critères.")
         sys.exit(0)
     
+    # Classer les commits qui n'ont pas été classés pendant la lecture du flux
+    if classifier and 'category' not in commits[0]:
+        for commit in commits:
+            classifier.classify(commit)
+    
+    # Balayage des paramètres: remplace le rapport habituel
+    if args.sweep:
+        try:
+            if args.dedupe_patches:
+                commits, removed = dedupe_patches(repo_path, commits, verbose)
+                print_info(f"{len(removed)} commits au patch identique écartés avant le balayage")
+            rows = sweep_work_time(commits, sweeps, verbose)
+            print_sweep_report(rows, args.sweep_export)
+        except Exception as e:
+            print_error(f"Erreur lors du balayage des paramètres: {str(e)}")
+            sys.exit(1)
+        execution_time = time.time() - start_time
+        print(f"\n{Colors.GREEN}Analyse terminée en {execution_time:.2f} secondes.{Colors.ENDC}")
+        return
+    
+    # Point de reprise de l'analyse détaillée (enregistré aussi en cas d'interruption)
+    checkpoint = None
+    if args.checkpoint and not (args.sample or args.time_budget):
+        signature = {key: getattr(args, key) for key in CHECKPOINT_ARGUMENTS}
+        checkpoint = AnalysisCheckpoint(repo_path, signature, tip, args.checkpoint_interval)
+        if args.resume:
+            checkpoint.resume(verbose)
+        checkpoint.install_signal_handlers()
+    
     # Calculer les sessions et estimer le temps
+    dedupe = None
     try:
-        sessions = calculate_work_sessions(commits, args.threshold, verbose)
+        if sessions is None:
+            sessions = calculate_work_sessions(commits, args.threshold, verbose)
+        
+        # Écarter les commits cherry-pickés ou rebasés en double
+        if args.dedupe_patches:
+            kept, removed = dedupe_patches(repo_path, commits, verbose)
+            if removed:
+                hours_before = estimate_work_time(sessions)['total_hours']
+                commits = kept
+                sessions = calculate_work_sessions(commits, args.threshold, verbose)
+                dedupe = {'removed': len(removed),
+                          'hours_removed': hours_before - estimate_work_time(sessions)['total_hours']}
+            else:
+                dedupe = {'removed': 0, 'hours_removed': 0.0}
+        
         time_estimate = estimate_work_time(sessions, verbose)
     except Exception as e:
         print_error(f"Erreur lors de l'analyse des commits: {str(e)}")
         sys.exit(1)
     
+    # Séries glissantes par auteur
+    rolling = None
+    if args.rolling:
+        rolling = compute_rolling_series(commits, time_estimate, rolling_windows, args.threshold)
+    
+    # Répartition par type de travail
+    categories = None
+    if classifier:
+        categories = summarize_categories(sessions, time_estimate)
+    
+    # Caches des statistiques par commit
+    stats_stores = []
+    if commit_cache:
+        stats_stores.append(commit_cache)
+    if global_cache:
+        global_cache.describe(commits)
+        stats_stores.append(global_cache)
+    if prefetched_numstat is not None:
+        stats_stores.append(PrefetchedStatsStore(prefetched_numstat))
+    if args.notes:
+        stats_stores.append(NotesStatsStore(repo_path, args.notes_ref))
+    
+    # Agrégats tenus à jour par les hooks: valables seulement pour l'historique complet de la branche
+    cache_rollups = None
+    if commit_cache and not (args.where or args.author or args.since or args.until or args.max_commits
+                             or args.dedupe_patches or args.recurse_submodules):
+        try:
+            cache_rollups = commit_cache.rollups(args.threshold)
+        except Exception as e:
+            print_warning(f"Impossible de lire les agrégats du cache: {str(e)}")
+    
     # Afficher le rapport
     try:
         print_report(repo_path, repo_info, commits, sessions, time_estimate, 
-                    args.author, args.since, args.until, args.branch, verbose, detailed)
+                    args.author, args.since, args.until, args.branch, verbose, detailed,
+                    args.sample, args.time_budget, args.sample_seed, stats_stores,
+                    args.hotspots, args.hotspots_max_paths, rolling, dedupe, categories, checkpoint,
+                    summarize_repositories(commits, args.threshold) if args.recurse_submodules else None,
+                    submodule_stores, cache_rollups)
     except Exception as e:
         print_error(f"Erreur lors de la génération du rapport: {str(e)}")
         sys.exit(1)
     
+    if checkpoint:
+        checkpoint.clear()
+    
+    # Enregistrer les statistiques nouvellement calculées (sous-modules compris)
+    for _, repo_stores in (submodule_stores or {}).values():
+        stats_stores.extend(store for store in repo_stores if store not in stats_stores)
+    for store in stats_stores:
+        try:
+            store.flush(verbose)
+        except Exception as e:
+            print_warning(f"Impossible d'enregistrer les statistiques dans le cache: {str(e)}")
+    
+    if args.cache_stats:
+        if global_cache:
+            global_cache.print_stats()
+        else:
+            print_warning("--cache-stats: le cache utilisateur n'est utilisé qu'en mode détaillé (--detailed) et sans --no-global-cache")
+    
     # Exporter les résultats si demandé
     if args.export:
         try:
@@ -994,6 +3998,20 @@ def main():
         except Exception as e:
             print_error(f"Erreur lors de l'exportation: {str(e)}")
     
+    if rolling and args.rolling_export:
+        try:
+            export_rolling_series(args.rolling_export, rolling)
+        except Exception as e:
+            print_error(f"Erreur lors de l'export des séries glissantes: {str(e)}")
+    
+    # Exporter en NDJSON si demandé
+    if args.ndjson_dir:
+        try:
+            export_to_ndjson(args.ndjson_dir, repo_path, repo_info, commits, args.threshold, args.branch,
+                             args.ndjson_format, args.ndjson_max_bytes, args.ndjson_index, verbose)
+        except Exception as e:
+            print_error(f"Erreur lors de l'export NDJSON: {str(e)}")
+    
     # Afficher le temps d'exécution
     execution_time = time.time() - start_time
     print(f"\n{Colors.GREEN}Analyse terminée en {execution_time:.2f} secondes.{Colors.ENDC}")